@@ -3,21 +3,33 @@ Discord Bot for Personal Data Storage
 Main entry point for the Discord bot that handles DMs and stores user data.
 """
 
+import os
+
+# Single-threaded Tesseract per OCR worker; must be set before Tesseract loads
+os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 import logging
-import os
+import random
 import asyncio
 import threading
 import time
-from collections import defaultdict
+import re
+from collections import deque
+from cachetools import TTLCache
 from storage import UserStorage
 from ocr import ImageOCR
 from commands import CommandHandler
 from config import Config
-from keep_alive import start_keep_alive
 from monitoring import monitor, record_operation
 
+try:
+    # Optional: SIMD multi-pattern matcher for the suspicious-content check
+    import hyperscan
+except ImportError:
+    hyperscan = None
+
 # Configure logging
 logging.basicConfig(
     level=getattr(logging, Config.LOG_LEVEL.upper()),
@@ -29,11 +41,29 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Don't assemble tracebacks for logging errors outside of debugging
+logging.raiseExceptions = Config.LOG_LEVEL.upper() == 'DEBUG'
+
 # Bot configuration
 intents = discord.Intents.default()
 intents.message_content = True
 intents.dm_messages = True
 
+# Static footer for the wake-up summary
+WAKE_UP_COMMANDS = """💡 **Available Commands:**
+• `!get password <label>` - Get a saved password
+• `!get credentials` - Get all your credentials
+• `!get credential <label>` - Get specific credentials
+• `!get notes` - Get all your notes
+• `!get emails` - Get all your emails
+• `!get links` - Get all your links
+• `!search <term>` - Search through your data
+• `!recent [number]` - Show recent messages
+• `!list` - Show data summary
+• `!help` - Show all commands
+
+💬 **Just send me any message and I'll store it!** I'll categorize passwords, emails, links, and notes automatically."""
+
 class PersonalDataBot(commands.Bot):
     def __init__(self):
         super().__init__(
@@ -42,13 +72,25 @@ class PersonalDataBot(commands.Bot):
             help_command=None  # Disable default help command
         )
         self.storage = UserStorage(Config.DATABASE_PATH)
-        self.ocr = ImageOCR(Config.TESSERACT_PATH)
+        self.ocr = ImageOCR(Config.TESSERACT_PATH, Config.OCR_WORKERS)
         self.command_handler = CommandHandler(self.storage, self.ocr)
         
         # Rate limiting
-        self.user_message_times = defaultdict(list)
         self.max_messages_per_minute = 10
         self.max_commands_per_minute = 5
+        self.rate_limit_window = 60  # seconds
+        # Inactive users expire automatically; each history is a fixed-size ring buffer
+        self.user_message_times = TTLCache(maxsize=100_000, ttl=2 * self.rate_limit_window)
+        
+        # Set once the first on_ready has run
+        self._initialized = False
+        
+        # Message rows are written in batches by a background task
+        self._write_q = asyncio.Queue()
+        self._writer_task = None
+        
+        # Bound how many images are buffered in memory at once across all users
+        self._image_download_sem = asyncio.Semaphore(4)
         
         # Security measures
         self.blocked_users = set()
@@ -58,17 +100,44 @@ class PersonalDataBot(commands.Bot):
             r'<@&\d+>',   # Role mentions
             r'<a?:\w+:\d+>',  # Emojis
         ]
+        # Single alternation so each message is scanned once; the patterns
+        # are plain ASCII, so matching runs on the encoded bytes
+        self._suspicious_re = re.compile(
+            b"|".join(b"(?:" + p.encode('ascii') + b")" for p in self.suspicious_patterns)
+        )
+        self._suspicious_db = self._compile_suspicious_db()
+        
+    async def setup_hook(self):
+        """Start background tasks once, before connecting to Discord."""
+        # Start the batched message writer
+        self._writer_task = self.loop.create_task(self._message_writer())
         
     async def on_ready(self):
         """Called when the bot is ready and connected to Discord."""
-        logger.info(f'{self.user} has connected to Discord!')
-        logger.info(f'Bot is in {len(self.guilds)} guilds')
+        logger.info('%s has connected to Discord!', self.user)
+        logger.info('Bot is in %d guilds', len(self.guilds))
+        
+        # on_ready fires again after every reconnect; only set up once
+        if self._initialized:
+            return
+        self._initialized = True
         
         # Initialize storage
         await self.storage.initialize()
         
         # Start keep-alive task for Replit
-        self.loop.create_task(self.keep_alive())
+        self.keep_alive.start()
+        
+    async def close(self):
+        """Flush pending writes and shut down OCR workers along with the Discord connection."""
+        if self._writer_task is not None:
+            try:
+                await asyncio.wait_for(self._write_q.join(), timeout=5)
+            except asyncio.TimeoutError:
+                logger.warning("Dropped %d unwritten messages on shutdown", self._write_q.qsize())
+            self._writer_task.cancel()
+        self.ocr.close()
+        await super().close()
         
     async def on_message(self, message):
         """Handle incoming messages."""
@@ -84,111 +153,156 @@ class PersonalDataBot(commands.Bot):
         if message.author.id in self.blocked_users:
             return
             
+        content = message.content
+        is_command = content.startswith('!')
+        
         # Rate limiting
-        if not await self._check_rate_limit(message.author.id, message.content.startswith('!')):
+        if not await self._check_rate_limit(message.author.id, is_command):
             await message.reply("⚠️ Rate limit exceeded. Please slow down.")
             return
         
         # Content sanitization
-        if await self._is_suspicious_content(message.content):
-            logger.warning(f"Suspicious content from {message.author.name}: {message.content[:100]}")
+        if await self._is_suspicious_content(content):
+            logger.warning("Suspicious content from %s: %.100s", message.author.name, content)
             await message.reply("⚠️ Your message contains potentially harmful content and was blocked.")
             return
             
-        logger.info(f"DM from {message.author.name} ({message.author.id}): {message.content[:100]}...")
+        logger.info("DM from %s (%s): %.100s...", message.author.name, message.author.id, content)
         
         # Record message processing
         monitor.record_message()
         
         # Check for wake-up command first
-        if message.content.lower().startswith('!wake') or message.content.lower().startswith('!hey'):
+        if is_command and content[:5].lower().startswith(('!wake', '!hey')):
             await self._handle_wake_up(message)
             return
         
         # Store the message content
-        await self.storage.store_message(
-            user_id=message.author.id,
-            content=message.content,
-            message_type="text"
-        )
+        self._queue_message(message.author.id, content, "text")
         
         # Handle attachments (images)
         if message.attachments:
-            for attachment in message.attachments:
-                if attachment.content_type and attachment.content_type.startswith('image/'):
-                    logger.info(f"Processing image from {message.author.name}")
-                    try:
-                        # Check file size (limit to 10MB)
-                        if attachment.size > 10 * 1024 * 1024:
-                            await self.storage.store_message(
-                                user_id=message.author.id,
-                                content=f"[IMAGE ERROR] Image too large ({attachment.size} bytes). Maximum size is 10MB.",
-                                message_type="error"
-                            )
-                            continue
-                        
-                        # Download and process image
-                        image_data = await attachment.read()
-                        extracted_text = await self.ocr.extract_text(image_data)
-                        
-                        if extracted_text:
-                            # Store the original OCR text as a message
-                            await self.storage.store_message(
-                                user_id=message.author.id,
-                                content=f"[IMAGE OCR] {extracted_text}",
-                                message_type="image_ocr"
-                            )
-                            
-                            # Process the extracted text through auto-categorization
-                            # This will automatically detect and store passwords, emails, links, etc.
-                            await self.command_handler._auto_categorize_and_store(
-                                user_id=message.author.id,
-                                content=extracted_text
-                            )
-                            
-                            logger.info(f"OCR extracted and categorized text: {extracted_text[:100]}...")
-                        else:
-                            await self.storage.store_message(
-                                user_id=message.author.id,
-                                content=f"[IMAGE OCR] No text found in image",
-                                message_type="image_ocr"
-                            )
-                    except Exception as e:
-                        logger.error(f"Error processing image: {e}")
-                        await self.storage.store_message(
-                            user_id=message.author.id,
-                            content=f"[IMAGE ERROR] Failed to process image: {str(e)}",
-                            message_type="error"
-                        )
+            await self._handle_image_attachments(message)
         
         # Check for commands
-        if message.content.startswith('!'):
+        if is_command:
             try:
                 monitor.record_command()
+                # Commands may read or clear messages, so write pending rows first
+                await self._write_q.join()
                 response = await self.command_handler.handle_command(
                     user_id=message.author.id,
-                    command=message.content
+                    command=content
                 )
                 if response:
                     await message.reply(response)
             except Exception as e:
                 monitor.record_error("command_error", str(e))
-                logger.error(f"Error handling command: {e}")
+                logger.error("Error handling command: %s", e)
                 await message.reply("Sorry, there was an error processing your command.")
         else:
             # Auto-categorize and store non-command messages
             try:
                 await self.command_handler._auto_categorize_and_store(
                     user_id=message.author.id,
-                    content=message.content
+                    content=content
                 )
             except Exception as e:
-                logger.error(f"Error auto-categorizing message: {e}")
+                logger.error("Error auto-categorizing message: %s", e)
+    
+    def _queue_message(self, user_id: int, content: str, message_type: str):
+        """Queue a message row for the background writer."""
+        self._write_q.put_nowait((user_id, content, message_type))
+    
+    async def _message_writer(self):
+        """Drain queued message rows and write them in batches."""
+        while True:
+            batch = [await self._write_q.get()]
+            while len(batch) < 100:
+                try:
+                    batch.append(self._write_q.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+            try:
+                await self.storage.store_messages_bulk(batch)
+            except Exception as e:
+                logger.error("Error writing message batch: %s", e)
+            finally:
+                for _ in batch:
+                    self._write_q.task_done()
+    
+    async def _read_attachment(self, attachment) -> bytes:
+        """Download an attachment, limiting concurrent in-memory downloads."""
+        async with self._image_download_sem:
+            return await attachment.read()
+    
+    async def _handle_image_attachments(self, message):
+        """Download all image attachments concurrently and OCR them in parallel."""
+        user_id = message.author.id
+        images = []
+        
+        for attachment in message.attachments:
+            if not (attachment.content_type and attachment.content_type.startswith('image/')):
+                continue
+            # Check file size (limit to 10MB)
+            if attachment.size > 10 * 1024 * 1024:
+                self._queue_message(
+                    user_id,
+                    f"[IMAGE ERROR] Image too large ({attachment.size} bytes). Maximum size is 10MB.",
+                    "error"
+                )
+                continue
+            images.append(attachment)
+        
+        if not images:
+            return
+        
+        logger.info("Processing %d image(s) from %s", len(images), message.author.name)
+        
+        # Download all images at once
+        downloads = await asyncio.gather(
+            *(self._read_attachment(attachment) for attachment in images),
+            return_exceptions=True
+        )
+        
+        image_data = []
+        for result in downloads:
+            if isinstance(result, Exception):
+                logger.error("Error downloading image: %s", result)
+                self._queue_message(user_id, f"[IMAGE ERROR] Failed to process image: {str(result)}", "error")
+            else:
+                image_data.append(result)
+        
+        # OCR every image at once, each in its own worker submission
+        texts = await self.ocr.extract_texts(image_data) if image_data else []
+        
+        extracted = [text for text in texts if text]
+        for text in texts:
+            self._queue_message(
+                user_id,
+                f"[IMAGE OCR] {text}" if text else "[IMAGE OCR] No text found in image",
+                "image_ocr"
+            )
+        
+        # Process the extracted text through auto-categorization
+        # This will automatically detect and store passwords, emails, links, etc.
+        for text in extracted:
+            try:
+                await self.command_handler._auto_categorize_and_store(
+                    user_id=user_id,
+                    content=text
+                )
+                logger.info("OCR extracted and categorized text: %.100s...", text)
+            except Exception as e:
+                logger.error("Error auto-categorizing image text: %s", e)
     
     async def _handle_wake_up(self, message):
         """Handle wake-up command and process entire conversation."""
         user_id = message.author.id
-        logger.info(f"Wake-up command from {message.author.name}")
+        logger.info("Wake-up command from %s", message.author.name)
+        
+        # Make sure queued messages are visible before reading them back
+        await self._write_q.join()
         
         # Get all messages from the user
         all_messages = await self.storage.get_recent_messages(user_id, 100)  # Get last 100 messages
@@ -206,142 +320,151 @@ class PersonalDataBot(commands.Bot):
     
     async def _process_conversation_history(self, user_id: str, messages: list):
         """Process entire conversation history and categorize content."""
-        logger.info(f"Processing {len(messages)} messages for user {user_id}")
-        
-        # Track what we've already processed to avoid duplicates
-        processed_content = set()
+        logger.info("Processing %d messages for user %s", len(messages), user_id)
         
+        # Stored messages are unique per user, so no extra deduplication is needed
         for msg in messages:
             if msg['type'] not in ['text', 'image_ocr']:
                 continue
                 
             content = msg['content']
             if content.startswith('[IMAGE OCR]'):
-                content = content[11:].strip()  # Remove prefix
+                content = content[11:]  # Remove prefix
             elif content.startswith('[IMAGE ERROR]'):
                 continue  # Skip error messages
             elif content.startswith('!'):
                 continue  # Skip commands
-            
-            # Skip if we've already processed this exact content
-            content_hash = hash(content.strip())
-            if content_hash in processed_content:
-                continue
-            processed_content.add(content_hash)
+            content = content.strip()
             
             # Auto-categorize the content
             await self.command_handler._auto_categorize_and_store(user_id, content)
     
     async def _generate_conversation_summary(self, user_id: str, messages: list) -> str:
         """Generate a comprehensive summary of the conversation."""
-        # Get categorized data
-        categories = await self.storage.get_all_categories(user_id)
-        notes = await self.storage.get_notes(user_id)
-        emails = await self.storage.get_emails(user_id)
-        links = await self.storage.get_links(user_id)
-        
-        response = "🤖 **I'm awake and ready!** Here's what I found in our conversation:\n\n"
-        
-        # Summary of data
-        response += "📊 **Your Data Summary:**\n"
-        response += f"• 📝 Total Messages: {categories['total_messages']}\n"
-        response += f"• 🔑 Passwords: {categories['passwords']}\n"
-        response += f"• 👤 Credentials: {categories['credentials']}\n"
-        response += f"• 📄 Notes: {categories['notes']}\n"
-        response += f"• 📧 Emails: {categories['emails']}\n"
-        response += f"• 🔗 Links: {categories['links']}\n\n"
+        # Get categorized data (queries run concurrently, only 3 of each are shown)
+        categories, notes, emails, links, credentials = await asyncio.gather(
+            self.storage.get_all_categories(user_id),
+            self.storage.get_notes(user_id, limit=3),
+            self.storage.get_emails(user_id, limit=3),
+            self.storage.get_links(user_id, limit=3),
+            self.storage.get_all_credentials(user_id, limit=3)
+        )
+        
+        parts = [
+            "🤖 **I'm awake and ready!** Here's what I found in our conversation:",
+            "",
+            # Summary of data
+            "📊 **Your Data Summary:**",
+            f"• 📝 Total Messages: {categories['total_messages']}",
+            f"• 🔑 Passwords: {categories['passwords']}",
+            f"• 👤 Credentials: {categories['credentials']}",
+            f"• 📄 Notes: {categories['notes']}",
+            f"• 📧 Emails: {categories['emails']}",
+            f"• 🔗 Links: {categories['links']}",
+            "",
+        ]
         
         # Recent highlights
-        credentials = await self.storage.get_all_credentials(user_id)
         if credentials:
-            response += "👤 **Recent Credentials:**\n"
-            for cred in credentials[:3]:  # Show 3 most recent
-                response += f"• **{cred['label']}**: {cred['username']}\n"
-            response += "\n"
+            parts.append("👤 **Recent Credentials:**")
+            parts.extend(f"• **{cred['label']}**: {cred['username']}" for cred in credentials)
+            parts.append("")
         
         if notes:
-            response += "📝 **Recent Notes:**\n"
-            for note in notes[:3]:  # Show 3 most recent
-                response += f"• {note[:100]}{'...' if len(note) > 100 else ''}\n"
-            response += "\n"
+            parts.append("📝 **Recent Notes:**")
+            parts.extend(f"• {note[:100]}{'...' if len(note) > 100 else ''}" for note in notes)
+            parts.append("")
         
         if emails:
-            response += "📧 **Saved Emails:**\n"
-            for email_data in emails[:3]:  # Show 3 most recent
-                response += f"• {email_data['email']}\n"
-            response += "\n"
+            parts.append("📧 **Saved Emails:**")
+            parts.extend(f"• {email_data['email']}" for email_data in emails)
+            parts.append("")
         
         if links:
-            response += "🔗 **Saved Links:**\n"
-            for link_data in links[:3]:  # Show 3 most recent
+            parts.append("🔗 **Saved Links:**")
+            for link_data in links:
                 link_type = f" [{link_data['type']}]" if link_data['type'] else ""
-                response += f"• {link_data['url']}{link_type}\n"
-            response += "\n"
-        
-        # Available commands
-        response += "💡 **Available Commands:**\n"
-        response += "• `!get password <label>` - Get a saved password\n"
-        response += "• `!get credentials` - Get all your credentials\n"
-        response += "• `!get credential <label>` - Get specific credentials\n"
-        response += "• `!get notes` - Get all your notes\n"
-        response += "• `!get emails` - Get all your emails\n"
-        response += "• `!get links` - Get all your links\n"
-        response += "• `!search <term>` - Search through your data\n"
-        response += "• `!recent [number]` - Show recent messages\n"
-        response += "• `!list` - Show data summary\n"
-        response += "• `!help` - Show all commands\n\n"
-        
-        response += "💬 **Just send me any message and I'll store it!** I'll categorize passwords, emails, links, and notes automatically."
-        
-        return response
+                parts.append(f"• {link_data['url']}{link_type}")
+            parts.append("")
+        
+        parts.append(WAKE_UP_COMMANDS)
+        
+        return "\n".join(parts)
     
     async def _check_rate_limit(self, user_id: int, is_command: bool = False) -> bool:
         """Check if user is within rate limits."""
-        current_time = time.time()
-        user_times = self.user_message_times[user_id]
-        
-        # Clean old entries (older than 1 minute)
-        user_times[:] = [t for t in user_times if current_time - t < 60]
+        now = time.monotonic()
+        user_times = self.user_message_times.get(user_id)
+        if user_times is None:
+            user_times = deque(maxlen=max(self.max_messages_per_minute, self.max_commands_per_minute))
         
-        # Check limits
+        # Check limits: the Nth most recent message must be outside the window
         max_allowed = self.max_commands_per_minute if is_command else self.max_messages_per_minute
         
-        if len(user_times) >= max_allowed:
+        if len(user_times) >= max_allowed and now - user_times[-max_allowed] < self.rate_limit_window:
             return False
         
-        # Add current message time
-        user_times.append(current_time)
+        # Add current message time (re-inserting refreshes the TTL)
+        user_times.append(now)
+        self.user_message_times[user_id] = user_times
         return True
     
+    def _compile_suspicious_db(self):
+        """Compile suspicious patterns into a Hyperscan database, if available."""
+        if hyperscan is None:
+            return None
+        try:
+            db = hyperscan.Database()
+            db.compile(
+                expressions=[p.encode('utf-8') for p in self.suspicious_patterns],
+                ids=list(range(len(self.suspicious_patterns))),
+                flags=[hyperscan.HS_FLAG_SINGLEMATCH] * len(self.suspicious_patterns)
+            )
+            return db
+        except Exception as e:
+            logger.warning("Hyperscan unavailable, using re for content checks: %s", e)
+            return None
+    
     async def _is_suspicious_content(self, content: str) -> bool:
         """Check if content contains suspicious patterns."""
-        import re
+        # Check for excessive length
+        if len(content) > 2000:
+            return True
+        
+        # Encode once; both the pattern scan and spam check work on bytes
+        data = content.encode('utf-8', 'replace')
         
         # Check for suspicious patterns
-        for pattern in self.suspicious_patterns:
-            if re.search(pattern, content):
+        if self._suspicious_db is not None:
+            matched = False
+            
+            def on_match(pattern_id, start, end, flags, context):
+                nonlocal matched
+                matched = True
+            
+            self._suspicious_db.scan(data, match_event_handler=on_match)
+            if matched:
                 return True
-        
-        # Check for excessive length
-        if len(content) > 2000:
+        elif self._suspicious_re.search(data):
             return True
         
         # Check for potential spam patterns
-        if content.count('!') > 10:  # Too many commands
+        if data.count(b'!') > 10:  # Too many commands
             return True
         
         return False
     
+    @tasks.loop(minutes=5, reconnect=True)
     async def keep_alive(self):
-        """Keep the bot alive on Replit by pinging every 5 minutes."""
-        while True:
-            try:
-                # Ping every 5 minutes to keep Replit alive
-                await asyncio.sleep(300)  # 5 minutes
-                logger.info("Keep-alive ping sent")
-            except Exception as e:
-                logger.error(f"Error in keep-alive: {e}")
-                await asyncio.sleep(60)  # Wait 1 minute before retrying
+        """Keep the bot alive on Replit by pinging every ~5 minutes."""
+        logger.info("Keep-alive ping sent")
+        # Jitter the next ping so restarted instances don't ping in lockstep
+        self.keep_alive.change_interval(seconds=300 + random.uniform(-30, 30))
+    
+    @keep_alive.error
+    async def keep_alive_error(self, error):
+        """Log keep-alive failures."""
+        logger.error("Error in keep-alive: %s", error)
 
 def main():
     """Main function to run the bot."""
@@ -349,16 +472,18 @@ def main():
     if not Config.validate():
         return
     
-    # Run setup validation
-    try:
-        from validate_setup import run_validation
-        if not run_validation():
-            logger.error("Setup validation failed. Please fix the issues and try again.")
-            return
-    except ImportError:
-        logger.warning("Setup validation script not found, skipping validation")
+    # Run setup validation (set PW_SKIP_VALIDATE=true for faster restarts)
+    if not Config.SKIP_VALIDATION:
+        try:
+            from validate_setup import run_validation
+            if not run_validation():
+                logger.error("Setup validation failed. Please fix the issues and try again.")
+                return
+        except ImportError:
+            logger.warning("Setup validation script not found, skipping validation")
     
     # Start keep-alive server for Replit
+    from keep_alive import start_keep_alive
     start_keep_alive()
     
     # Create and run the bot
@@ -371,7 +496,7 @@ def main():
         logger.error("Invalid Discord bot token!")
         monitor.record_error("login_failure", "Invalid bot token")
     except Exception as e:
-        logger.error(f"Error running bot: {e}")
+        logger.error("Error running bot: %s", e)
         monitor.record_error("bot_startup_error", str(e))
 
 if __name__ == "__main__":
@@ -4,33 +4,289 @@ Handles Discord bot commands and trigger words for user interactions.
 """
 
 import re
+import string
+import functools
+import hashlib
 import logging
+from collections import OrderedDict
 from typing import Optional, Dict, Any
 from urllib.parse import urlparse
 
+try:
+    # Optional: linear-time (non-backtracking) engine for the email/URL scans
+    import re2
+except ImportError:
+    re2 = None
+
+try:
+    # Optional: one vectorized pass to tell whether a message has any email/URL at all
+    import hyperscan
+except ImportError:
+    hyperscan = None
+
 logger = logging.getLogger(__name__)
 
+# Character classes for _looks_like_password; the ASCII sets are only used for ASCII words,
+# where they agree with str.isupper/islower/isdigit
+_ASCII_UPPER = frozenset(string.ascii_uppercase)
+_ASCII_LOWER = frozenset(string.ascii_lowercase)
+_ASCII_DIGITS = frozenset(string.digits)
+_SPECIAL_CHARS = frozenset('!@#$%^&*()_+-=[]{}|;:,.<>?')
+_PASSWORD_FALSE_POSITIVES = frozenset({
+    'user', 'username', 'password', 'pass', 'pwd', 'gmail', 'email', 'login', 'account', 'id', 'name', 'label'
+})
+
+# Words _looks_like_username never accepts
+_USERNAME_BLACKLIST = frozenset({
+    'user', 'username', 'password', 'pass', 'pwd', 'email', 'login', 'account', 'id', 'name'
+})
+
+# Filler words _find_label_before skips when looking for a label
+_LABEL_STOP_WORDS = frozenset({'for', 'the', 'my', 'is', 'to', 'and', 'or', ':', '-', '–', '—'})
+
+
+@functools.lru_cache(maxsize=4096)
+def _looks_like_password(word: str) -> bool:
+    """Check if a word looks like a password (cached: the same tokens recur across messages)."""
+    if len(word) < 8:  # Increase minimum length
+        return False
+    
+    # Skip common false positives - be very aggressive here
+    word_lower = word.lower()
+    if word_lower in _PASSWORD_FALSE_POSITIVES:
+        return False
+    
+    # Don't consider anything that starts with common prefixes
+    if word_lower.startswith(('user', 'email', 'login', 'account')):
+        return False
+    
+    # Basic password characteristics
+    chars = set(word)
+    has_special = not _SPECIAL_CHARS.isdisjoint(chars)
+    if word.isascii():
+        has_upper = not _ASCII_UPPER.isdisjoint(chars)
+        has_lower = not _ASCII_LOWER.isdisjoint(chars)
+        has_digit = not _ASCII_DIGITS.isdisjoint(chars)
+    else:
+        has_upper = any(c.isupper() for c in chars)
+        has_lower = any(c.islower() for c in chars)
+        has_digit = any(c.isdigit() for c in chars)
+    
+    # Require at least 3 character types for passwords
+    char_types = has_upper + has_lower + has_digit + has_special
+    if char_types < 2:
+        return False
+    
+    # Strong password indicators
+    if len(word) >= 8 and char_types >= 3:
+        return True
+    
+    # Medium password indicators
+    if len(word) >= 12 and char_types >= 2:
+        return True
+    
+    return False
+
+
+def _compile_scanner(pattern: str):
+    """Compile a scanning pattern with RE2 when available, otherwise with re."""
+    if re2 is not None:
+        try:
+            return re2.compile(pattern)
+        except Exception as e:
+            logger.debug(f"RE2 cannot compile {pattern!r}, using re: {e}")
+    # RE2's \b, \s and \w are ASCII-only; re.ASCII gives the fallback the same semantics
+    return re.compile(pattern, re.ASCII)
+
+
 class CommandHandler:
     """Handles command processing and responses."""
     
+    __slots__ = (
+        'storage', 'ocr',
+        'email_pattern', 'url_pattern', '_presence_db', 'username_pattern',
+        'simple_pattern', 'colon_slash_pattern', 'credential_line_pattern',
+        'keyword_pattern', 'quick_pass_pattern',
+        'password_indicator_pattern', 'username_indicator_pattern', 'indicator_pattern',
+        '_indicator_words', '_quote_trans',
+        '_command_table', '_command_index', '_command_pairs', '_command_head_len',
+        '_seen_content', '_seen_content_limit',
+    )
+    
+    # Rows shown by the list-style commands before "... and N more"
+    PAGE_SIZE = 10
+    
+    # Response to !list, filled from storage.get_all_categories
+    LIST_TEMPLATE = (
+        "**Your Stored Data:**\n"
+        "📝 Total Messages: {total_messages}\n"
+        "🔑 Passwords: {passwords}\n"
+        "👤 Credentials: {credentials}\n"
+        "📄 Notes: {notes}\n"
+        "📧 Emails: {emails}\n"
+        "🔗 Links: {links}\n"
+    )
+    
+    # Response to !help
+    HELP_TEXT = """**🤖 Personal Data Bot - Help**
+
+**⚡ SUPER QUICK (Most Convenient):**
+`!s <service> <username> <password>` - Lightning fast credential storage
+`!p <service> <password>` - Quick password-only storage
+Just type: `Gmail nepal@email.com mypass123` - Auto-detects everything!
+Natural: `Netflix user: john pass: abc123` - Understands human format
+
+**📥 STORAGE COMMANDS:**
+`!store <service> <username> <password>` - Store credentials
+`!store <service> <password>` - Store password only
+`!save <anything>` - Auto-categorize and store any data
+`!add <anything>` - Smart auto-detection and storage
+
+**📤 RETRIEVAL COMMANDS:**
+`!get password <label>` - Get a saved password
+`!get credentials` - Get all your saved credentials
+`!get credential <label>` - Get specific credentials by label
+`!get notes` - Get all your notes
+`!get emails` - Get all your saved emails
+`!get links` - Get all your saved links
+
+**🔍 SEARCH & MANAGE:**
+`!search <term>` - Search through your stored data
+`!recent [number]` - Show recent messages (default: 5)
+`!list` - List all your stored data categories
+`!clear` - Clear all your data
+`!clear duplicates` - Remove duplicate entries
+`!wake` - Get conversation summary
+
+**🎯 CONVENIENT INPUT FORMATS:**
+• **Super Quick**: `!s Gmail john@email.com mypass123`
+• **Password Only**: `!p Netflix secretpass456`
+• **Natural**: `Gmail user: john@email.com pass: mypass123`
+• **Simple**: `gmail john@email.com mypass123`
+• **With slash**: `Netflix: user123/pass456`
+• **Line format**: `Gmail\nuser: john\npass: abc123`
+
+**🔄 AUTO-DETECTION:**
+- **Emails**: Any email address will be saved
+- **Links**: Any URL will be saved (YouTube, GitHub, etc.)
+- **Images**: OCR text will be extracted and categorized
+- **Notes**: Any other text becomes a note
+
+**💡 Pro Tips:**
+• Just send any message - I'll categorize it automatically!
+• Use `!wake` to get a complete summary of our conversation
+• Use quotes for services with spaces: `!store "My Bank" user pass`"""
+    
+    # Link type for each known site; subdomains are matched by _link_type
+    _LINK_TYPES = {
+        'youtube.com': 'youtube',
+        'youtu.be': 'youtube',
+        'github.com': 'github',
+        'stackoverflow.com': 'stackoverflow',
+        'reddit.com': 'reddit',
+        'twitter.com': 'twitter',
+        'x.com': 'twitter',
+    }
+    
     def __init__(self, storage, ocr):
         self.storage = storage
         self.ocr = ocr
         
-        # Email regex pattern
-        self.email_pattern = re.compile(
-            r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
+        # Email addresses, as one alternation so the text is scanned once:
+        # plain addresses first, then OCR text with spaces around "@" and ".".
+        # Parts are capped at their RFC lengths (64-char local part, 253-char domain,
+        # 63-char label) so a backtracking engine does bounded work per position
+        # instead of rescanning to the end of long dotted runs.
+        email_regex = (
+            r'\b[A-Za-z0-9._%+-]{1,64}@[A-Za-z0-9.-]{1,253}\.[A-Za-z]{2,63}\b'
+            r'|\b[A-Za-z0-9._%-]{1,64}\s*@\s*[A-Za-z0-9.-]{1,253}\s*\.\s*[A-Za-z]{2,63}\b'
         )
-        
-        # URL regex pattern
-        self.url_pattern = re.compile(
-            r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+'
+        self.email_pattern = _compile_scanner(email_regex)
+        
+        # URLs, as one alternation: http(s) URLs, then ones with OCR spaces in them,
+        # then bare domains. Earlier alternatives win, so a URL is not also picked up
+        # as a space-glued run or as a bare domain inside it.
+        # (note "$-_" is a range and covers "/", ":", "?" and "=")
+        url_regex = (
+            r'http[s]?://[a-zA-Z0-9$-_@.&+!*(),%]+'
+            r'|http[s]?\s*:\s*//\s*[a-zA-Z0-9$-_@.&+!*(),%\s]+'
+            r'|\b(?:www\.)?[a-zA-Z0-9][a-zA-Z0-9-]{1,61}[a-zA-Z0-9]\.[a-zA-Z]{2,}(?:/[^\s]*)?'
         )
-        
-        # YouTube URL pattern
-        self.youtube_pattern = re.compile(
-            r'(?:https?://)?(?:www\.)?(?:youtube\.com/watch\?v=|youtu\.be/)([a-zA-Z0-9_-]{11})'
+        self.url_pattern = _compile_scanner(url_regex)
+        
+        # Hyperscan database reporting which of (email, URL) occur in a message
+        self._presence_db = self._compile_presence_db(email_regex, url_regex)
+        
+        # Username characters
+        self.username_pattern = re.compile(r'^[a-zA-Z0-9._-]+$')
+        
+        # Convenient credential input formats. Text reaching these has already had its
+        # whitespace collapsed to plain spaces, so ASCII \s is enough; simple_pattern keeps
+        # Unicode \w so service names like "Café" still count as one word. The others go
+        # through RE2 when it is installed: patterns like colon_slash backtrack
+        # quadratically in re on long lines that almost match.
+        self.simple_pattern = re.compile(r'(\w+)\s+([^\s]+)\s+([^\s]+)', re.IGNORECASE)
+        self.colon_slash_pattern = _compile_scanner(r'([^:\n]+):\s*([^/\s]+)/([^\s\n]+)')
+        # "user: ..." / "pass: ..." lines; the named group says which one matched
+        self.credential_line_pattern = _compile_scanner(
+            r'(?i)(?:(?P<user>user|username|id|email)|(?P<password>pass|password|pwd)):\s*(?P<value>.+)'
         )
+        self.keyword_pattern = _compile_scanner(r'(?i)(?:user|username|id)\s+([^\s]+)\s+(?:pass|password|pwd)\s+([^\s]+)(?:\s+for\s+([^\n]+))?')
+        self.quick_pass_pattern = _compile_scanner(r'(?i)(?:pass|password|pwd)\s+(?:for\s+)?([^:\n]+):\s*([^\s\n]+)')
+        
+        # Indicator words for _detect_credentials_intelligently, matched anywhere in
+        # already-lowercased text ("pass" also covers "password", "user" covers "username")
+        self.password_indicator_pattern = re.compile(r'pass|pwd|key|secret|token|auth|login')
+        self.username_indicator_pattern = re.compile(r'user|email|login|id|account')
+        self.indicator_pattern = re.compile(r'pass|pwd|key|secret|token|auth|login|user|email|id|account')
+        self._indicator_words = frozenset((
+            'password', 'pass', 'pwd', 'key', 'secret', 'token', 'auth', 'login',
+            'username', 'user', 'email', 'id', 'account'
+        ))
+        
+        # Typographic quotes and dashes (common in OCR output) mapped to ASCII
+        self._quote_trans = str.maketrans({
+            '\u201c': '"',  # left double quote
+            '\u201d': '"',  # right double quote
+            '\u2018': "'",  # left single quote
+            '\u2019': "'",  # right single quote
+            '\u2013': '-',  # en dash
+            '\u2014': '-',  # em dash
+        })
+        
+        # Command prefixes in priority order (longer prefixes before the ones they extend).
+        # Each entry is (prefix, handler, whether the handler takes the command text).
+        self._command_table = (
+            ('!get password', self._handle_get_password, True),
+            ('!get credentials', self._handle_get_credentials, False),
+            ('!get credential', self._handle_get_credential, True),
+            ('!get notes', self._handle_get_notes, False),
+            ('!get emails', self._handle_get_emails, False),
+            ('!get links', self._handle_get_links, False),
+            ('!store', self._handle_quick_store, True),
+            ('!save', self._handle_quick_store, True),
+            ('!s ', self._handle_super_quick_store, True),  # Super quick store
+            ('!p ', self._handle_quick_password_only, True),  # Quick password only
+            ('!add', self._handle_add, True),
+            ('!list', self._handle_list, False),
+            ('!clear duplicates', self._handle_clear_duplicates, False),
+            ('!clear', self._handle_clear, False),
+            ('!help', self._handle_help, False),
+            ('!recent', self._handle_recent, True),
+            ('!search', self._handle_search, True),
+        )
+        # Entries grouped by their first token, so most commands only check a few prefixes
+        self._command_index = {}
+        for entry in self._command_table:
+            self._command_index.setdefault(entry[0].split()[0], []).append(entry)
+        # Two-word commands ("!get notes", "!clear duplicates") resolve with one dict probe
+        self._command_pairs = {entry[0]: entry for entry in self._command_table if ' ' in entry[0].strip()}
+        # One character past the longest prefix, so a two-word lookup never sees a cut-off word
+        self._command_head_len = max(len(entry[0]) for entry in self._command_table) + 1
+        
+        # LRU of (user_id, content digest) already categorized, to skip repeats
+        self._seen_content = OrderedDict()
+        self._seen_content_limit = 10_000
     
     async def handle_command(self, user_id: str, command: str) -> Optional[str]:
         """
@@ -43,50 +299,36 @@ class CommandHandler:
         Returns:
             Response message or None if no response needed
         """
-        command = command.strip().lower()
-        
         try:
-            # Handle different command types
-            if command.startswith('!get password'):
-                return await self._handle_get_password(user_id, command)
-            elif command.startswith('!get credentials'):
-                return await self._handle_get_credentials(user_id)
-            elif command.startswith('!get credential'):
-                return await self._handle_get_credential(user_id, command)
-            elif command.startswith('!get notes'):
-                return await self._handle_get_notes(user_id)
-            elif command.startswith('!get emails'):
-                return await self._handle_get_emails(user_id)
-            elif command.startswith('!get links'):
-                return await self._handle_get_links(user_id)
-            elif command.startswith('!store') or command.startswith('!save'):
-                return await self._handle_quick_store(user_id, command)
-            elif command.startswith('!s '):  # Super quick store
-                return await self._handle_super_quick_store(user_id, command)
-            elif command.startswith('!p '):  # Quick password only
-                return await self._handle_quick_password_only(user_id, command)
-            elif command.startswith('!add'):
-                return await self._handle_add(user_id, command)
-            elif command.startswith('!list'):
-                return await self._handle_list(user_id)
-            elif command.startswith('!clear duplicates'):
-                return await self._handle_clear_duplicates(user_id)
-            elif command.startswith('!clear'):
-                return await self._handle_clear(user_id)
-            elif command.startswith('!help'):
-                return await self._handle_help(user_id)
-            elif command.startswith('!recent'):
-                return await self._handle_recent(user_id, command)
-            elif command.startswith('!search'):
-                return await self._handle_search(user_id, command)
-            else:
-                # Don't auto-categorize commands that start with ! but aren't recognized
-                if command.startswith('!'):
-                    return "❌ Unknown command. Type `!help` to see all available commands."
-                else:
-                    # Auto-categorize and store non-command messages
-                    await self._auto_categorize_and_store(user_id, command)
-                    return None
+            # Nothing to dispatch or store in an empty or whitespace-only message
+            if not command or command.isspace():
+                return None
+            
+            # Non-commands (possibly long OCR text) go straight to auto-categorization,
+            # as sent; only commands need trimming for dispatch
+            if not command.lstrip().startswith('!'):
+                await self._auto_categorize_and_store(user_id, command)
+                return None
+            
+            command = command.strip()
+            # Commands are matched case-insensitively on a lowercased head only long
+            # enough to hold any prefix; handlers get the text as typed, so stored
+            # passwords, usernames and labels keep their case
+            head = command[:self._command_head_len].lower()
+            
+            # Try an exact two-word command, then the candidates for the first token;
+            # unusual spellings like "!storefoo" fall back to scanning the full table
+            token, _, rest = head.partition(' ')
+            pair = self._command_pairs.get(f"{token} {rest.partition(' ')[0]}")
+            candidates = (pair,) if pair else self._command_index.get(token, self._command_table)
+            for prefix, handler, takes_command in candidates:
+                if head.startswith(prefix):
+                    if takes_command:
+                        return await handler(user_id, command)
+                    return await handler(user_id)
+            
+            # Don't auto-categorize commands that start with ! but aren't recognized
+            return "❌ Unknown command. Type `!help` to see all available commands."
                 
         except Exception as e:
             logger.error(f"Error handling command '{command}': {e}")
@@ -108,37 +350,42 @@ class CommandHandler:
     
     async def _handle_get_notes(self, user_id: str) -> str:
         """Handle !get notes command."""
-        notes = await self.storage.get_notes(user_id)
+        # One extra row tells us whether there is anything beyond the first page
+        notes = await self.storage.get_notes(user_id, limit=self.PAGE_SIZE + 1)
         
         if not notes:
             return "No notes found."
         
-        response = "**Your Notes:**\n"
-        for i, note in enumerate(notes[:10], 1):  # Limit to 10 most recent
-            response += f"{i}. {note}\n"
+        parts = ["**Your Notes:**\n"]
+        parts.extend(f"{i}. {note}\n" for i, note in enumerate(notes[:self.PAGE_SIZE], 1))
         
-        if len(notes) > 10:
-            response += f"\n... and {len(notes) - 10} more notes."
+        if len(notes) > self.PAGE_SIZE:
+            total = await self.storage.count_category(user_id, "notes")
+            parts.append(f"\n... and {total - self.PAGE_SIZE} more notes.")
         
-        return response
+        return "".join(parts)
     
     async def _handle_get_credentials(self, user_id: str) -> str:
         """Handle !get credentials command."""
-        credentials = await self.storage.get_all_credentials(user_id)
+        # One extra row tells us whether there is anything beyond the first page
+        credentials = await self.storage.get_all_credentials(user_id, limit=self.PAGE_SIZE + 1)
         
         if not credentials:
             return "No credentials found."
         
-        response = "**Your Credentials:**\n"
-        for i, cred in enumerate(credentials[:10], 1):  # Limit to 10 most recent
-            response += f"{i}. **{cred['label']}**\n"
-            response += f"   Username: `{cred['username']}`\n"
-            response += f"   Password: `{cred['password']}`\n\n"
+        parts = ["**Your Credentials:**\n"]
+        parts.extend(
+            f"{i}. **{cred['label']}**\n"
+            f"   Username: `{cred['username']}`\n"
+            f"   Password: `{cred['password']}`\n\n"
+            for i, cred in enumerate(credentials[:self.PAGE_SIZE], 1)
+        )
         
-        if len(credentials) > 10:
-            response += f"... and {len(credentials) - 10} more credentials."
+        if len(credentials) > self.PAGE_SIZE:
+            total = await self.storage.count_category(user_id, "credentials")
+            parts.append(f"... and {total - self.PAGE_SIZE} more credentials.")
         
-        return response
+        return "".join(parts)
     
     async def _handle_get_credential(self, user_id: str, command: str) -> str:
         """Handle !get credential <label> command."""
@@ -156,58 +403,55 @@ class CommandHandler:
     
     async def _handle_get_emails(self, user_id: str) -> str:
         """Handle !get emails command."""
-        emails = await self.storage.get_emails(user_id)
+        # One extra row tells us whether there is anything beyond the first page
+        emails = await self.storage.get_emails(user_id, limit=self.PAGE_SIZE + 1)
         
         if not emails:
             return "No emails found."
         
-        response = "**Your Emails:**\n"
-        for i, email_data in enumerate(emails[:10], 1):  # Limit to 10 most recent
+        parts = ["**Your Emails:**\n"]
+        for i, email_data in enumerate(emails[:self.PAGE_SIZE], 1):
             label = f" ({email_data['label']})" if email_data['label'] else ""
-            response += f"{i}. {email_data['email']}{label}\n"
+            parts.append(f"{i}. {email_data['email']}{label}\n")
         
-        if len(emails) > 10:
-            response += f"\n... and {len(emails) - 10} more emails."
+        if len(emails) > self.PAGE_SIZE:
+            total = await self.storage.count_category(user_id, "emails")
+            parts.append(f"\n... and {total - self.PAGE_SIZE} more emails.")
         
-        return response
+        return "".join(parts)
     
     async def _handle_get_links(self, user_id: str) -> str:
         """Handle !get links command."""
-        links = await self.storage.get_links(user_id)
+        # One extra row tells us whether there is anything beyond the first page
+        links = await self.storage.get_links(user_id, limit=self.PAGE_SIZE + 1)
         
         if not links:
             return "No links found."
         
-        response = "**Your Links:**\n"
-        for i, link_data in enumerate(links[:10], 1):  # Limit to 10 most recent
+        parts = ["**Your Links:**\n"]
+        for i, link_data in enumerate(links[:self.PAGE_SIZE], 1):
             link_type = f" [{link_data['type']}]" if link_data['type'] else ""
-            response += f"{i}. {link_data['url']}{link_type}\n"
+            parts.append(f"{i}. {link_data['url']}{link_type}\n")
         
-        if len(links) > 10:
-            response += f"\n... and {len(links) - 10} more links."
+        if len(links) > self.PAGE_SIZE:
+            total = await self.storage.count_category(user_id, "links")
+            parts.append(f"\n... and {total - self.PAGE_SIZE} more links.")
         
-        return response
+        return "".join(parts)
     
     async def _handle_list(self, user_id: str) -> str:
         """Handle !list command."""
         categories = await self.storage.get_all_categories(user_id)
         
-        response = "**Your Stored Data:**\n"
-        response += f"📝 Total Messages: {categories['total_messages']}\n"
-        response += f"🔑 Passwords: {categories['passwords']}\n"
-        response += f"👤 Credentials: {categories['credentials']}\n"
-        response += f"📄 Notes: {categories['notes']}\n"
-        response += f"📧 Emails: {categories['emails']}\n"
-        response += f"🔗 Links: {categories['links']}\n"
+        if not any(categories.values()):
+            return "No data stored yet. Send me messages, passwords, notes, emails, or links!"
         
-        if sum(categories.values()) == 0:
-            response = "No data stored yet. Send me messages, passwords, notes, emails, or links!"
-        
-        return response
+        return self.LIST_TEMPLATE.format_map(categories)
     
     async def _handle_clear(self, user_id: str) -> str:
         """Handle !clear command."""
         await self.storage.clear_user_data(user_id)
+        self._forget_seen_content(user_id)
         return "✅ All your data has been cleared."
     
     async def _handle_clear_duplicates(self, user_id: str) -> str:
@@ -221,78 +465,28 @@ class CommandHandler:
     
     async def _handle_help(self, user_id: str) -> str:
         """Handle !help command."""
-        return """**🤖 Personal Data Bot - Help**
-
-**⚡ SUPER QUICK (Most Convenient):**
-`!s <service> <username> <password>` - Lightning fast credential storage
-`!p <service> <password>` - Quick password-only storage
-Just type: `Gmail nepal@email.com mypass123` - Auto-detects everything!
-Natural: `Netflix user: john pass: abc123` - Understands human format
-
-**📥 STORAGE COMMANDS:**
-`!store <service> <username> <password>` - Store credentials
-`!store <service> <password>` - Store password only
-`!save <anything>` - Auto-categorize and store any data
-`!add <anything>` - Smart auto-detection and storage
-
-**📤 RETRIEVAL COMMANDS:**
-`!get password <label>` - Get a saved password
-`!get credentials` - Get all your saved credentials
-`!get credential <label>` - Get specific credentials by label
-`!get notes` - Get all your notes
-`!get emails` - Get all your saved emails
-`!get links` - Get all your saved links
-
-**🔍 SEARCH & MANAGE:**
-`!search <term>` - Search through your stored data
-`!recent [number]` - Show recent messages (default: 5)
-`!list` - List all your stored data categories
-`!clear` - Clear all your data
-`!clear duplicates` - Remove duplicate entries
-`!wake` - Get conversation summary
-
-**🎯 CONVENIENT INPUT FORMATS:**
-• **Super Quick**: `!s Gmail john@email.com mypass123`
-• **Password Only**: `!p Netflix secretpass456`
-• **Natural**: `Gmail user: john@email.com pass: mypass123`
-• **Simple**: `gmail john@email.com mypass123`
-• **With slash**: `Netflix: user123/pass456`
-• **Line format**: `Gmail\nuser: john\npass: abc123`
-
-**🔄 AUTO-DETECTION:**
-- **Emails**: Any email address will be saved
-- **Links**: Any URL will be saved (YouTube, GitHub, etc.)
-- **Images**: OCR text will be extracted and categorized
-- **Notes**: Any other text becomes a note
-
-**💡 Pro Tips:**
-• Just send any message - I'll categorize it automatically!
-• Use `!wake` to get a complete summary of our conversation
-• Use quotes for services with spaces: `!store "My Bank" user pass`"""
+        return self.HELP_TEXT
     
     async def _handle_recent(self, user_id: str, command: str) -> str:
         """Handle !recent command."""
-        parts = command.split()
+        # Only the first argument matters, so don't split the rest
+        parts = command.split(None, 2)
         limit = 5
         
-        if len(parts) > 1:
-            try:
-                limit = int(parts[1])
-                limit = min(limit, 20)  # Cap at 20
-            except ValueError:
-                pass
+        if len(parts) > 1 and parts[1].isdecimal():
+            limit = min(int(parts[1]), 20)  # Cap at 20
         
         messages = await self.storage.get_recent_messages(user_id, limit)
         
         if not messages:
             return "No recent messages found."
         
-        response = f"**Recent Messages ({len(messages)}):**\n"
+        parts = [f"**Recent Messages ({len(messages)}):**\n"]
         for i, msg in enumerate(messages, 1):
             content = msg['content'][:100] + "..." if len(msg['content']) > 100 else msg['content']
-            response += f"{i}. [{msg['type']}] {content}\n"
+            parts.append(f"{i}. [{msg['type']}] {content}\n")
         
-        return response
+        return "".join(parts)
     
     async def _handle_search(self, user_id: str, command: str) -> str:
         """Handle !search command."""
@@ -301,30 +495,30 @@ Natural: `Netflix user: john pass: abc123` - Understands human format
             return "Usage: `!search <term>`"
         
         search_term = ' '.join(parts[1:]).lower()
-        messages = await self.storage.get_recent_messages(user_id, 50)  # Search in last 50 messages
-        
-        matches = []
-        for msg in messages:
-            if search_term in msg['content'].lower():
-                matches.append(msg)
+        # One extra row tells us whether there is anything beyond the first page
+        matches = await self.storage.search_messages(user_id, search_term, limit=self.PAGE_SIZE + 1)
         
         if not matches:
             return f"No matches found for '{search_term}'"
         
-        response = f"**Search Results for '{search_term}' ({len(matches)} matches):**\n"
-        for i, msg in enumerate(matches[:10], 1):  # Limit to 10 results
+        total = len(matches)
+        if total > self.PAGE_SIZE:
+            total = await self.storage.count_search_matches(user_id, search_term)
+        
+        parts = [f"**Search Results for '{search_term}' ({total} matches):**\n"]
+        for i, msg in enumerate(matches[:self.PAGE_SIZE], 1):
             content = msg['content'][:150] + "..." if len(msg['content']) > 150 else msg['content']
-            response += f"{i}. [{msg['type']}] {content}\n"
+            parts.append(f"{i}. [{msg['type']}] {content}\n")
         
-        if len(matches) > 10:
-            response += f"\n... and {len(matches) - 10} more matches."
+        if total > self.PAGE_SIZE:
+            parts.append(f"\n... and {total - self.PAGE_SIZE} more matches.")
         
-        return response
+        return "".join(parts)
     
     async def _handle_quick_store(self, user_id: str, command: str) -> str:
         """Handle !store and !save commands for quick credential storage."""
         # Remove the command prefix and get the content
-        content = command[6:].strip() if command.startswith('!store') else command[5:].strip()
+        content = command[6:].strip() if command[:6].lower() == '!store' else command[5:].strip()
         
         if not content:
             return """**Quick Store Usage:**
@@ -449,6 +643,11 @@ Natural: `Netflix user: john pass: abc123` - Understands human format
         if not content or not content.strip():
             return
         
+        # Skip content this user already sent (e.g. the same OCR text twice)
+        seen_key = self._seen_content_key(user_id, content)
+        if self._check_seen_content(seen_key):
+            return
+        
         # Basic content validation
         if len(content) > 10000:
             logger.warning(f"Content too long from user {user_id}, truncating")
@@ -460,160 +659,202 @@ Natural: `Netflix user: john pass: abc123` - Understands human format
         
         # Smart password and credential detection patterns
         # Detect any potential password-like content automatically
-        potential_credentials = self._detect_credentials_intelligently(content)
-        for cred in potential_credentials:
-            try:
-                if cred['type'] == 'credential':
-                    await self.storage.store_credential(user_id, cred['label'], cred['username'], cred['password'])
-                    logger.info(f"Auto-detected and stored credentials for user {user_id}: {cred['label']}")
-                elif cred['type'] == 'password':
-                    await self.storage.store_password(user_id, cred['label'], cred['password'])
-                    logger.info(f"Auto-detected and stored password for user {user_id}: {cred['label']}")
-            except Exception as e:
-                logger.error(f"Error storing auto-detected credential: {e}")
-                continue
+        potential_credentials = self._detect_credentials_intelligently(content, content_lower)
+        detected = list(potential_credentials)
         
         # Enhanced convenient detection patterns (only if no strong credentials were found above)
         if not potential_credentials:
-            convenient_credentials = self._detect_convenient_formats(content)
-            for cred in convenient_credentials:
-                try:
-                    if cred['type'] == 'credential':
-                        await self.storage.store_credential(user_id, cred['label'], cred['username'], cred['password'])
-                        logger.info(f"Stored convenient format credentials for user {user_id}: {cred['label']}")
-                    elif cred['type'] == 'password':
-                        await self.storage.store_password(user_id, cred['label'], cred['password'])
-                        logger.info(f"Stored convenient format password for user {user_id}: {cred['label']}")
-                except Exception as e:
-                    logger.error(f"Error storing convenient format credential: {e}")
-                    continue
+            detected.extend(self._detect_convenient_formats(content))
         
         # Add ultra-convenient single line detection
-        ultra_convenient = self._detect_ultra_convenient_formats(content)
-        for cred in ultra_convenient:
-            try:
-                if cred['type'] == 'credential':
-                    await self.storage.store_credential(user_id, cred['label'], cred['username'], cred['password'])
-                    logger.info(f"Stored ultra-convenient credentials for user {user_id}: {cred['label']}")
-                elif cred['type'] == 'password':
-                    await self.storage.store_password(user_id, cred['label'], cred['password'])
-                    logger.info(f"Stored ultra-convenient password for user {user_id}: {cred['label']}")
-            except Exception as e:
-                logger.error(f"Error storing ultra-convenient credential: {e}")
-                continue
+        detected.extend(self._detect_ultra_convenient_formats(content))
         
-        # Check for email addresses with enhanced patterns for OCR text
-        email_patterns = [
-            self.email_pattern,  # Original pattern
-            # OCR-friendly pattern that handles common OCR mistakes
-            re.compile(r'\b[A-Za-z0-9._%-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'),
-            # Pattern that handles spaces around @ and dots (common OCR errors)
-            re.compile(r'\b[A-Za-z0-9._%-]+\s*@\s*[A-Za-z0-9.-]+\s*\.\s*[A-Z|a-z]{2,}\b'),
+        # Everything found is written in one storage call at the end
+        credentials = [
+            (cred['label'], cred['username'], cred['password'])
+            for cred in detected if cred['type'] == 'credential'
+        ]
+        passwords = [
+            (cred['label'], cred['password'])
+            for cred in detected if cred['type'] == 'password'
         ]
         
+        has_email, has_url = self._scan_presence(content)
+        
+        # Check for email addresses, including OCR-spaced ones
+        # Collect distinct matches before cleaning them
+        raw_emails = set(self.email_pattern.findall(content)) if has_email else set()
+        
         emails_found = set()
-        for pattern in email_patterns:
-            emails = pattern.findall(content)
-            for email in emails:
-                # Clean up the email (remove spaces around @ and dots)
-                clean_email = re.sub(r'\s*@\s*', '@', email)
-                clean_email = re.sub(r'\s*\.\s*', '.', clean_email)
-                
-                if clean_email and clean_email.strip() and '@' in clean_email and '.' in clean_email:
-                    emails_found.add(clean_email.strip())
-        
-        for email in emails_found:
-            await self.storage.store_email(user_id, email)
-            logger.info(f"Stored email for user {user_id}: {email}")
-        
-        # Check for URLs with enhanced patterns for OCR text
-        url_patterns = [
-            self.url_pattern,  # Original pattern
-            # Pattern that handles spaces in URLs (common OCR error)
-            re.compile(r'http[s]?\s*:\s*//\s*(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F])|\s)+'),
-            # Pattern for URLs without http/https
-            re.compile(r'\b(?:www\.)?[a-zA-Z0-9][a-zA-Z0-9-]{1,61}[a-zA-Z0-9]\.[a-zA-Z]{2,}(?:/[^\s]*)?'),
-        ]
+        for email in raw_emails:
+            # Clean up the email (remove spaces around @ and dots). The content's whitespace
+            # is already collapsed to single spaces, and the pattern only allows them
+            # next to "@" and ".", so dropping every space is enough.
+            clean_email = email.replace(' ', '') if ' ' in email else email
+            
+            if clean_email and clean_email.strip() and '@' in clean_email and '.' in clean_email:
+                emails_found.add(clean_email.strip())
+        
+
+        # Check for URLs, including OCR-spaced ones and bare domains
+        raw_urls = set(self.url_pattern.findall(content)) if has_url else set()
         
         urls_found = set()
-        for pattern in url_patterns:
-            urls = pattern.findall(content)
-            for url in urls:
-                # Clean up the URL (remove spaces)
-                clean_url = re.sub(r'\s+', '', url)
-                
-                # Add http:// if missing
-                if clean_url and not clean_url.startswith(('http://', 'https://')):
-                    clean_url = 'http://' + clean_url
-                
-                if clean_url and self.is_valid_url(clean_url):
-                    urls_found.add(clean_url)
-        
-        for url in urls_found:
-            # Determine link type
-            link_type = "general"
-            url_lower = url.lower()
-            if self.youtube_pattern.search(url):
-                link_type = "youtube"
-            elif "github.com" in url_lower:
-                link_type = "github"
-            elif "stackoverflow.com" in url_lower:
-                link_type = "stackoverflow"
-            elif "youtube.com" in url_lower or "youtu.be" in url_lower:
-                link_type = "youtube"
-            elif "reddit.com" in url_lower:
-                link_type = "reddit"
-            elif "twitter.com" in url_lower or "x.com" in url_lower:
-                link_type = "twitter"
+        for url in raw_urls:
+            # Clean up the URL (remove spaces; other whitespace was collapsed to spaces)
+            clean_url = url.replace(' ', '') if ' ' in url else url
             
-            await self.storage.store_link(user_id, url, link_type)
-            logger.info(f"Stored {link_type} link for user {user_id}: {url}")
+            # Add http:// if missing
+            if clean_url and not clean_url.startswith(('http://', 'https://')):
+                clean_url = 'http://' + clean_url
+            
+            if clean_url and self.is_valid_url(clean_url):
+                urls_found.add(clean_url)
         
         # If it's not a command and contains text, store as a note
+        note = None
         if not content.startswith('!') and content.strip():
-            # Don't store if it's just an email or URL (already stored above)
+            # Don't store if it's just an email or URL (stored on their own)
             # Also check if content was already processed as credentials
             content_has_structured_data = bool(emails_found or urls_found or potential_credentials)
             
             # Only store as note if there's meaningful text beyond structured data
             if not content_has_structured_data or len(content.strip()) > 50:
-                await self.storage.store_note(user_id, content.strip())
-                logger.info(f"Stored note for user {user_id}")
+                note = content.strip()
+        stored_note = note is not None
+        
+        if credentials or passwords or emails_found or urls_found or stored_note:
+            stored = await self.storage.store_bulk(
+                user_id,
+                passwords=passwords,
+                credentials=credentials,
+                emails=emails_found,
+                links=[(url, self._link_type(url)) for url in urls_found],
+                note=note
+            )
+            if not stored:
+                # Leave the content unmarked so sending it again retries the write
+                return
+            logger.info(
+                f"Auto-stored for user {user_id}: credentials={len(credentials)} passwords={len(passwords)} "
+                f"emails={len(emails_found)} links={len(urls_found)} note={stored_note}"
+            )
+        
+        self._mark_seen_content(seen_key)
     
-    def _detect_credentials_intelligently(self, content: str) -> list:
+    def _compile_presence_db(self, email_regex: str, url_regex: str):
+        """Compile the email and URL patterns into a Hyperscan database, if available."""
+        if hyperscan is None:
+            return None
+        try:
+            db = hyperscan.Database()
+            db.compile(
+                expressions=[email_regex.encode('ascii'), url_regex.encode('ascii')],
+                ids=[0, 1],
+                flags=[hyperscan.HS_FLAG_SINGLEMATCH] * 2
+            )
+            return db
+        except Exception as e:
+            logger.warning(f"Hyperscan unavailable, using substring checks before email/URL scans: {e}")
+            return None
+    
+    def _scan_presence(self, content: str) -> tuple:
+        """Return (may contain an email, may contain a URL) so empty regex scans can be skipped."""
+        if self._presence_db is not None:
+            found = set()
+            
+            def on_match(pattern_id, start, end, flags, context):
+                found.add(pattern_id)
+            
+            self._presence_db.scan(content.encode('utf-8', 'replace'), match_event_handler=on_match)
+            return 0 in found, 1 in found
+        
+        # Every email needs an "@"; every URL alternative needs "http" or a "."
+        return '@' in content, 'http' in content or '.' in content
+    
+    def _seen_content_key(self, user_id: str, content: str) -> tuple:
+        """Key for content in the seen-content cache."""
+        return (str(user_id), hashlib.blake2b(content.encode('utf-8', 'ignore'), digest_size=8).digest())
+    
+    def _check_seen_content(self, key: tuple) -> bool:
+        """Return True if the content behind key was already categorized and stored."""
+        if key in self._seen_content:
+            self._seen_content.move_to_end(key)
+            return True
+        return False
+    
+    def _mark_seen_content(self, key: tuple):
+        """Record content as categorized and stored, evicting the oldest entry if full."""
+        self._seen_content[key] = None
+        if len(self._seen_content) > self._seen_content_limit:
+            self._seen_content.popitem(last=False)
+    
+    def _forget_seen_content(self, user_id: str):
+        """Drop a user's entries from the seen-content cache."""
+        user_id = str(user_id)
+        for key in [key for key in self._seen_content if key[0] == user_id]:
+            del self._seen_content[key]
+    
+    def _detect_credentials_intelligently(self, content: str, content_lower: Optional[str] = None) -> list:
         """
         Intelligently detect passwords and credentials from any text format.
         Uses multiple heuristics to identify password-like content.
         """
         credentials = []
         words = content.split()
-        lines = content.split('\n')
         
-        # Heuristic 1: Look for password-like strings (8+ chars with mixed case/numbers/symbols)
-        potential_passwords = []
-        for word in words:
-            if self._looks_like_password(word):
-                potential_passwords.append(word)
+        password_indicator = self.password_indicator_pattern.search
+        username_indicator = self.username_indicator_pattern.search
+        any_indicator = self.indicator_pattern.search
+        indicator_words = self._indicator_words
         
-        # Heuristic 2: Context-based detection - look for words near password indicators
-        password_indicators = ['password', 'pass', 'pwd', 'key', 'secret', 'token', 'auth', 'login']
-        username_indicators = ['username', 'user', 'email', 'login', 'id', 'account']
+        # Every heuristic below needs an indicator word and a password-like value of
+        # 8+ characters (a single word, or the text after a colon)
+        if content_lower is None:
+            content_lower = content.lower()
+        if not any_indicator(content_lower):
+            return []
+        if ':' not in content and not any(len(word) >= 8 for word in words):
+            return []
         
+        lines = content.split('\n')
+        words_lower = [word.lower() for word in words]
+        # Classified once per distinct word and shared by heuristics 2, 3 and 4
+        password_like = {word: self._looks_like_password(word) for word in set(words)}
+        # Heuristic 4 finds are kept apart so they still rank after heuristics 2 and 3
+        context_credentials = []
+        
+        # Heuristics 2 and 4 share one pass over the words
         for i, word in enumerate(words):
-            word_lower = word.lower()
+            word_lower = words_lower[i]
+            
+            # Heuristic 4: Pattern-free detection - just look for password-like strings with context
+            if password_like[word]:
+                # Check if there's context around it
+                context = ' '.join(words_lower[max(0, i-3):i] + words_lower[i+1:i+4])
+                
+                # If there's password-related context, store it
+                if any_indicator(context):
+                    label = self._find_label_before(words, i) or 'Detected'
+                    # Don't store if it's just the word "user" or similar
+                    if word_lower not in ('user', 'username', 'password', 'pass', 'pwd', 'email', 'login'):
+                        context_credentials.append({
+                            'type': 'password',
+                            'label': label,
+                            'password': word
+                        })
             
+            # Heuristic 2: Context-based detection - look for words near password indicators
             # Check if current word is a password indicator
-            if any(indicator in word_lower for indicator in password_indicators):
+            if password_indicator(word_lower):
                 # Look for password in next few words
                 for j in range(i+1, min(i+5, len(words))):
                     next_word = words[j]
                     # Skip if the next word is just another indicator
-                    if next_word.lower() in password_indicators + username_indicators:
-                        continue
-                    # Explicit check to never store common keywords as passwords
-                    if next_word.lower() in ['user', 'username', 'password', 'pass', 'pwd', 'email', 'login', 'id', 'account']:
+                    # (this also keeps common keywords from being stored as passwords)
+                    if words_lower[j] in indicator_words:
                         continue
-                    if self._looks_like_password(next_word) and len(next_word) >= 8:
+                    if password_like[next_word]:
                         # Try to find a label (look backwards)
                         label = self._find_label_before(words, i)
                         credentials.append({
@@ -624,22 +865,19 @@ Natural: `Netflix user: john pass: abc123` - Understands human format
                         break
             
             # Check for username/password pairs
-            elif any(indicator in word_lower for indicator in username_indicators):
+            elif username_indicator(word_lower):
                 # Look for username and password in next few words
                 username = None
                 password = None
                 
                 for j in range(i+1, min(i+6, len(words))):
                     candidate = words[j]
-                    # Skip common keywords
-                    if candidate.lower() in password_indicators + username_indicators:
-                        continue
-                    # Never process 'user' as username or password
-                    if candidate.lower() in ['user', 'username', 'password', 'pass', 'pwd', 'email', 'login', 'id', 'account']:
+                    # Skip common keywords (never process 'user' as username or password)
+                    if words_lower[j] in indicator_words:
                         continue
                     if not username and self._looks_like_username(candidate):
                         username = candidate
-                    elif username and self._looks_like_password(candidate):
+                    elif username and password_like[candidate]:
                         password = candidate
                         break
                 
@@ -660,51 +898,29 @@ Natural: `Netflix user: john pass: abc123` - Understands human format
                 
             # Look for "key: value" patterns
             if ':' in line:
-                parts = line.split(':', 1)
-                if len(parts) == 2:
-                    key = parts[0].strip().lower()
-                    value = parts[1].strip()
-                    
-                    # Check if key suggests this is a password
-                    if any(indicator in key for indicator in password_indicators) and value and value.lower() not in ['user', 'username', 'password', 'pass', 'pwd']:
-                        label = key.replace('password', '').replace('pass', '').replace('pwd', '').strip()
-                        if not label:
-                            label = 'Detected'
-                        # Never store blacklisted words
-                        if value.lower() in ['user', 'username', 'password', 'pass', 'pwd', 'email', 'login', 'id', 'account']:
-                            continue
-                        # Only store if the value looks like an actual password
-                        if self._looks_like_password(value) and len(value) >= 8:
-                            credentials.append({
-                                'type': 'password',
-                                'label': label.title(),
-                                'password': value
-                            })
-        
-        # Heuristic 4: Pattern-free detection - just look for password-like strings with context
-        for i, word in enumerate(words):
-            if self._looks_like_password(word) and len(word) >= 8:
-                # Check if there's context around it
-                context_words = []
-                for j in range(max(0, i-3), min(len(words), i+4)):
-                    if j != i:
-                        context_words.append(words[j].lower())
+                key, _, value = line.partition(':')
+                key = key.strip().lower()
+                value = value.strip()
                 
-                # If there's password-related context, store it
-                if any(indicator in ' '.join(context_words) for indicator in password_indicators + username_indicators):
-                    label = self._find_label_before(words, i) or 'Detected'
-                    # Don't store if it's just the word "user" or similar
-                    if word.lower() not in ['user', 'username', 'password', 'pass', 'pwd', 'email', 'login']:
+                # Check if key suggests this is a password (never store blacklisted words)
+                if (value and password_indicator(key)
+                        and value.lower() not in ('user', 'username', 'password', 'pass', 'pwd', 'email', 'login', 'id', 'account')):
+                    # Only store if the value looks like an actual password
+                    is_password = password_like.get(value)
+                    if is_password is None:
+                        is_password = self._looks_like_password(value)
+                    if is_password:
+                        label = key.replace('password', '').replace('pass', '').replace('pwd', '').strip()
                         credentials.append({
                             'type': 'password',
-                            'label': label,
-                            'password': word
+                            'label': label.title() if label else 'Detected',
+                            'password': value
                         })
         
         # Remove duplicates based on password value
         seen_passwords = set()
         unique_credentials = []
-        for cred in credentials:
+        for cred in credentials + context_credentials:
             password = cred.get('password', '')
             if password not in seen_passwords:
                 seen_passwords.add(password)
@@ -752,39 +968,7 @@ Natural: `Netflix user: john pass: abc123` - Understands human format
     
     def _looks_like_password(self, word: str) -> bool:
         """Check if a word looks like a password."""
-        if len(word) < 8:  # Increase minimum length
-            return False
-        
-        # Skip common false positives - be very aggressive here
-        false_positives = ['user', 'username', 'password', 'pass', 'pwd', 'gmail', 'email', 'login', 'account', 'id', 'name', 'label']
-        if word.lower() in false_positives:
-            return False
-        
-        # Don't consider anything that starts with common prefixes
-        false_prefixes = ['user', 'email', 'login', 'account']
-        if any(word.lower().startswith(prefix) for prefix in false_prefixes):
-            return False
-        
-        # Basic password characteristics
-        has_upper = any(c.isupper() for c in word)
-        has_lower = any(c.islower() for c in word)
-        has_digit = any(c.isdigit() for c in word)
-        has_special = any(c in '!@#$%^&*()_+-=[]{}|;:,.<>?' for c in word)
-        
-        # Require at least 3 character types for passwords
-        char_types = sum([has_upper, has_lower, has_digit, has_special])
-        if char_types < 2:
-            return False
-        
-        # Strong password indicators
-        if len(word) >= 8 and char_types >= 3:
-            return True
-        
-        # Medium password indicators
-        if len(word) >= 12 and char_types >= 2:
-            return True
-        
-        return False
+        return _looks_like_password(word)
     
     def _looks_like_username(self, word: str) -> bool:
         """Check if a word looks like a username."""
@@ -792,8 +976,7 @@ Natural: `Netflix user: john pass: abc123` - Understands human format
             return False
         
         # Never consider these as usernames
-        blacklist = {'user', 'username', 'password', 'pass', 'pwd', 'email', 'login', 'account', 'id', 'name'}
-        if word.lower() in blacklist:
+        if word.lower() in _USERNAME_BLACKLIST:
             return False
         
         # Email-like usernames
@@ -801,7 +984,7 @@ Natural: `Netflix user: john pass: abc123` - Understands human format
             return True
         
         # Alphanumeric with some special chars
-        if re.match(r'^[a-zA-Z0-9._-]+$', word):
+        if self.username_pattern.match(word):
             return True
         
         return False
@@ -812,7 +995,7 @@ Natural: `Netflix user: john pass: abc123` - Understands human format
         for i in range(index-1, max(0, index-4), -1):
             word = words[i]
             # Skip common words
-            if word.lower() in ['for', 'the', 'my', 'is', 'to', 'and', 'or', ':', '-', '–', '—']:
+            if word.lower() in _LABEL_STOP_WORDS:
                 continue
             # Clean up the word and use it as label
             label = word.strip(':-–—').strip()
@@ -829,11 +1012,11 @@ Natural: `Netflix user: john pass: abc123` - Understands human format
         credentials = []
         lines = content.split('\n')
         content_lower = content.lower()
+        has_password_keyword = 'pass' in content_lower or 'pwd' in content_lower
         
         # Pattern 1: Simple "service user pass" format
         # Examples: "gmail john@email.com mypassword123", "netflix user123 pass456"
-        simple_pattern = re.compile(r'(\w+)\s+([^\s]+)\s+([^\s]+)', re.IGNORECASE)
-        for match in simple_pattern.finditer(content):
+        for match in self.simple_pattern.finditer(content):
             service, user, password = match.groups()
             # Better validation to avoid false positives
             if (len(password) >= 6 and len(user) >= 3 and 
@@ -849,8 +1032,7 @@ Natural: `Netflix user: john pass: abc123` - Understands human format
         
         # Pattern 2: "service: user/pass" format
         # Examples: "Netflix: user123/pass456", "Gmail: john@email.com/mypass"
-        colon_slash_pattern = re.compile(r'([^:\n]+):\s*([^/\s]+)/([^\s\n]+)', re.IGNORECASE)
-        for match in colon_slash_pattern.finditer(content):
+        for match in (self.colon_slash_pattern.finditer(content) if ':' in content and '/' in content else ()):
             service, user, password = match.groups()
             credentials.append({
                 'type': 'credential',
@@ -861,6 +1043,8 @@ Natural: `Netflix user: john pass: abc123` - Understands human format
         
         # Pattern 3: Line-by-line format
         # Examples: "Gmail\nuser: john@email.com\npass: mypass123"
+        # Classify every line once as a user field, password field, or neither
+        line_fields = [self.credential_line_pattern.match(line.strip()) for line in lines] if len(lines) > 2 else []
         for i, line in enumerate(lines):
             line = line.strip()
             if not line or len(lines) <= i + 2:
@@ -868,24 +1052,20 @@ Natural: `Netflix user: john pass: abc123` - Understands human format
                 
             # Check if this might be a service name
             if len(line.split()) <= 2 and len(line) < 50:
-                next_line = lines[i + 1].strip() if i + 1 < len(lines) else ""
-                third_line = lines[i + 2].strip() if i + 2 < len(lines) else ""
-                
-                user_match = re.match(r'(?:user|username|id|email):\s*(.+)', next_line, re.IGNORECASE)
-                pass_match = re.match(r'(?:pass|password|pwd):\s*(.+)', third_line, re.IGNORECASE)
+                user_match = line_fields[i + 1]
+                pass_match = line_fields[i + 2]
                 
-                if user_match and pass_match:
+                if user_match and user_match.group('user') and pass_match and pass_match.group('password'):
                     credentials.append({
                         'type': 'credential',
                         'label': line.title(),
-                        'username': user_match.group(1).strip(),
-                        'password': pass_match.group(1).strip()
+                        'username': user_match.group('value').strip(),
+                        'password': pass_match.group('value').strip()
                     })
         
         # Pattern 4: Space-separated with keywords
         # Examples: "user john password mypass123 for Gmail"
-        keyword_pattern = re.compile(r'(?:user|username|id)\s+([^\s]+)\s+(?:pass|password|pwd)\s+([^\s]+)(?:\s+for\s+([^\n]+))?', re.IGNORECASE)
-        for match in keyword_pattern.finditer(content):
+        for match in (self.keyword_pattern.finditer(content) if has_password_keyword else ()):
             user, password, service = match.groups()
             label = service.strip().title() if service else 'Account'
             credentials.append({
@@ -897,8 +1077,7 @@ Natural: `Netflix user: john pass: abc123` - Understands human format
         
         # Pattern 5: Quick password format
         # Examples: "pass for gmail: mypassword123", "password netflix: abc123"
-        quick_pass_pattern = re.compile(r'(?:pass|password|pwd)\s+(?:for\s+)?([^:\n]+):\s*([^\s\n]+)', re.IGNORECASE)
-        for match in quick_pass_pattern.finditer(content):
+        for match in (self.quick_pass_pattern.finditer(content) if has_password_keyword and ':' in content else ()):
             service, password = match.groups()
             credentials.append({
                 'type': 'password',
@@ -933,45 +1112,13 @@ Natural: `Netflix user: john pass: abc123` - Understands human format
         if not content:
             return content
         
-        # Remove excessive whitespace and normalize line breaks
-        lines = []
-        for line in content.split('\n'):
-            cleaned_line = ' '.join(line.split())  # Remove extra spaces
-            if cleaned_line:
-                lines.append(cleaned_line)
-        
-        content = '\n'.join(lines)
-        
-        # Common OCR corrections
-        replacements = {
-            # Common OCR character misreads
-            '0': 'O',  # zero to O in passwords/usernames
-            '1': 'I',  # one to I
-            '|': 'I',  # pipe to I
-            '5': 'S',  # five to S
-            # Normalize punctuation
-            '"': '"',  # smart quotes
-            '"': '"',
-            ''': "'",
-            ''': "'",
-            '–': '-',  # em dash to hyphen
-            '—': '-',
-        }
-        
-        # Apply replacements only in contexts where they make sense
-        # Be conservative to avoid corrupting actual data
-        words = content.split()
-        cleaned_words = []
-        
-        for word in words:
-            # Only apply OCR corrections to likely username/password fields
-            if any(keyword in content.lower() for keyword in ['username', 'password', 'user', 'pass', 'login', 'email']):
-                for old, new in replacements.items():
-                    if old in word and len(word) > 2:  # Only replace in longer words
-                        word = word.replace(old, new)
-            cleaned_words.append(word)
-        
-        return ' '.join(cleaned_words)
+        # Normalize punctuation, then collapse spaces and line breaks.
+        # Digit/letter look-alikes (0/O, 1/I, 5/S, |/I) are deliberately left alone:
+        # rewriting them corrupts real passwords and usernames.
+        # The table only maps non-ASCII characters, and isascii() is O(1).
+        if not content.isascii():
+            content = content.translate(self._quote_trans)
+        return ' '.join(content.split())
     
     def _detect_ultra_convenient_formats(self, content: str) -> list:
         """Detect ultra-convenient formats like 'Gmail user@email.com password123'."""
@@ -1007,10 +1154,31 @@ Natural: `Netflix user: john pass: abc123` - Understands human format
         
         return credentials
     
+    def _link_type(self, url: str) -> str:
+        """Classify a URL by its host (subdomains such as www. or m. count as the parent site)."""
+        try:
+            host = urlparse(url).hostname or ""
+        except ValueError:
+            return "general"
+        
+        while host:
+            link_type = self._LINK_TYPES.get(host)
+            if link_type:
+                return link_type
+            host = host.partition('.')[2]
+        return "general"
+    
     def is_valid_url(self, url: str) -> bool:
         """Check if a string is a valid URL."""
+        # Fast path for the plain http(s) URLs the scanners produce: the host is
+        # non-empty if something other than '/', '?' or '#' follows "://"
+        scheme, sep, rest = url.partition('://')
+        if sep and scheme in ('http', 'https') and not any(c in rest for c in '[]\t\r\n'):
+            return bool(rest) and rest[0] not in '/?#'
+        
         try:
             result = urlparse(url)
-            return all([result.scheme, result.netloc])
-        except:
+        except ValueError:
+            # e.g. an unbalanced '[' in the host
             return False
+        return bool(result.scheme and result.netloc)
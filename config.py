@@ -16,11 +16,17 @@ class Config:
     
     # OCR settings
     TESSERACT_PATH: Optional[str] = os.getenv('TESSERACT_PATH', None)
+    # Number of single-threaded OCR worker processes (Tesseract threads are
+    # capped via OMP_THREAD_LIMIT, which defaults to 1 in bot.py)
+    OCR_WORKERS: int = int(os.getenv('OCR_WORKERS', str(os.cpu_count() or 1)))
     
     # Logging settings
     LOG_LEVEL: str = os.getenv('LOG_LEVEL', 'INFO')
     LOG_FILE: str = os.getenv('LOG_FILE', 'bot.log')
     
+    # Startup settings
+    SKIP_VALIDATION: bool = os.getenv('PW_SKIP_VALIDATE', 'false').lower() == 'true'
+    
     # Bot behavior settings
     MAX_RECENT_MESSAGES: int = int(os.getenv('MAX_RECENT_MESSAGES', '50'))
     MAX_SEARCH_RESULTS: int = int(os.getenv('MAX_SEARCH_RESULTS', '10'))
@@ -43,6 +49,7 @@ class Config:
         print("Bot Configuration:")
         print(f"  Database Path: {cls.DATABASE_PATH}")
         print(f"  Tesseract Path: {cls.TESSERACT_PATH or 'Default'}")
+        print(f"  OCR Workers: {cls.OCR_WORKERS}")
         print(f"  Log Level: {cls.LOG_LEVEL}")
         print(f"  Log File: {cls.LOG_FILE}")
         print(f"  Max Recent Messages: {cls.MAX_RECENT_MESSAGES}")
@@ -5,28 +5,218 @@ Handles text extraction from images using pytesseract.
 
 import asyncio
 import logging
-from typing import Optional
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional
 import io
 from PIL import Image
 import pytesseract
 
+try:
+    # Optional: lets each worker keep one Tesseract instance loaded
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
+try:
+    # Optional: adaptive thresholding before OCR
+    import cv2
+    import numpy as np
+except ImportError:
+    cv2 = None
+
 logger = logging.getLogger(__name__)
 
+# Page segmentation modes tried for every image, best result wins
+PSM_MODES = [
+    6,   # Uniform block of text (default)
+    3,   # Fully automatic page segmentation
+    4,   # Single column of text
+    7,   # Single text line
+    8,   # Single word
+    11,  # Sparse text
+    12,  # Sparse text with OSD
+]
+
+# Larger images are downscaled to fit within this many pixels per side
+MAX_IMAGE_DIMENSION = 1600
+
+# Per-process Tesseract API, created once by _init_worker
+_worker_api = None
+
+
+def _init_worker(tesseract_path: Optional[str] = None):
+    """Initialize an OCR worker process."""
+    global _worker_api
+    
+    # One Tesseract thread per worker; parallelism comes from the pool
+    os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+    
+    if tesseract_path:
+        pytesseract.pytesseract.tesseract_cmd = tesseract_path
+    
+    if tesserocr is not None:
+        try:
+            _worker_api = tesserocr.PyTessBaseAPI(lang="eng")
+        except Exception as e:
+            logger.warning(f"tesserocr unavailable, falling back to pytesseract: {e}")
+            _worker_api = None
+
+
+def _ocr_with_api(image: Image.Image) -> str:
+    """Run all page segmentation modes through the persistent worker API."""
+    best_text = ""
+    best_confidence = 0
+    
+    for psm in PSM_MODES:
+        try:
+            # Tesseract caches the recognition result until the image is set again,
+            # so re-set it after each mode change to make the mode take effect
+            _worker_api.SetPageSegMode(psm)
+            _worker_api.SetImage(image)
+            text = _worker_api.GetUTF8Text()
+            
+            if text and text.strip():
+                confidence = _worker_api.MeanTextConf()
+                if (confidence > best_confidence and len(text.strip()) > len(best_text.strip())) or (not best_text and text.strip()):
+                    best_text = text
+                    best_confidence = confidence
+        except Exception as e:
+            logger.debug(f"OCR psm {psm} failed: {e}")
+            continue
+    
+    return best_text
+
+
+def _ocr_with_pytesseract(image: Image.Image) -> str:
+    """Run all page segmentation modes through the tesseract binary."""
+    best_text = ""
+    best_confidence = 0
+    
+    for psm in PSM_MODES:
+        config = f'--oem 3 --psm {psm}'
+        try:
+            # Extract text with current configuration
+            text = pytesseract.image_to_string(image, config=config)
+            
+            if text and text.strip():
+                # Try to get confidence score if possible
+                try:
+                    data = pytesseract.image_to_data(image, config=config, output_type=pytesseract.Output.DICT)
+                    confidences = [int(conf) for conf in data['conf'] if int(conf) > 0]
+                    avg_confidence = sum(confidences) / len(confidences) if confidences else 0
+                    
+                    # Choose text with highest confidence and reasonable length
+                    if (avg_confidence > best_confidence and len(text.strip()) > len(best_text.strip())) or (not best_text and text.strip()):
+                        best_text = text
+                        best_confidence = avg_confidence
+                except:
+                    # If confidence calculation fails, just use text length as metric
+                    if len(text.strip()) > len(best_text.strip()):
+                        best_text = text
+                        
+        except Exception as e:
+            logger.debug(f"OCR config {config} failed: {e}")
+            continue
+    
+    return best_text
+
+
+def _preprocess_image(image: Image.Image) -> Image.Image:
+    """Downscale and binarize an image so Tesseract has fewer pixels to work through."""
+    # Convert palette/transparent images first so thumbnail resamples real colors
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    image.thumbnail((MAX_IMAGE_DIMENSION, MAX_IMAGE_DIMENSION), Image.LANCZOS)
+    image = image.convert('L')
+    
+    if cv2 is not None:
+        binary = cv2.adaptiveThreshold(
+            np.asarray(image), 255,
+            cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY,
+            31, 10
+        )
+        image = Image.fromarray(binary)
+    
+    return image
+
+
+def _process_image_sync(image_data: bytes) -> str:
+    """
+    Synchronous image processing for OCR.
+    This runs in a worker process to avoid blocking the event loop.
+    """
+    try:
+        # Open image from bytes
+        image = _preprocess_image(Image.open(io.BytesIO(image_data)))
+        
+        if _worker_api is not None:
+            best_text = _ocr_with_api(image)
+        else:
+            best_text = _ocr_with_pytesseract(image)
+        
+        # Clean up the extracted text
+        if best_text:
+            # Remove excessive whitespace and clean up formatting
+            lines = [line.strip() for line in best_text.split('\n') if line.strip()]
+            best_text = '\n'.join(lines)
+            
+            # Look-alike characters (0/O, 5/S, |/I) are left as read: rewriting
+            # them would corrupt passwords and usernames in screenshots
+        
+        return best_text
+        
+    except pytesseract.TesseractNotFoundError:
+        logger.error("Tesseract OCR not found. Please install Tesseract OCR.")
+        return ""
+    except Exception as e:
+        logger.error(f"Error in synchronous OCR processing: {e}")
+        return ""
+
+
 class ImageOCR:
     """Handles OCR processing of images."""
     
-    def __init__(self, tesseract_path: Optional[str] = None):
+    def __init__(self, tesseract_path: Optional[str] = None, max_workers: Optional[int] = None):
         """
         Initialize the OCR processor.
         
         Args:
             tesseract_path: Path to tesseract executable (Windows only)
+            max_workers: Number of OCR worker processes (default: cpu_count)
         """
         self.tesseract_path = tesseract_path
         
         # Set tesseract path if provided (mainly for Windows)
         if tesseract_path:
             pytesseract.pytesseract.tesseract_cmd = tesseract_path
+        
+        # Worker processes keep Tesseract loaded between images
+        if max_workers is None:
+            max_workers = os.cpu_count() or 1
+        self.max_workers = max_workers
+        self._pool = self._create_pool()
+    
+    def _create_pool(self) -> ProcessPoolExecutor:
+        """Start the OCR worker processes."""
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            initializer=_init_worker,
+            initargs=(self.tesseract_path,)
+        )
+    
+    def _restart_pool(self, broken_pool: ProcessPoolExecutor):
+        """Replace a pool whose worker died (e.g. a Tesseract crash) so later calls still work."""
+        # Another call may already have replaced it
+        if self._pool is broken_pool:
+            logger.warning("OCR worker process died, restarting the worker pool")
+            broken_pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = self._create_pool()
+    
+    def close(self):
+        """Shut down the OCR worker processes."""
+        self._pool.shutdown(wait=False, cancel_futures=True)
     
     async def extract_text(self, image_data: bytes) -> Optional[str]:
         """
@@ -39,13 +229,18 @@ class ImageOCR:
             Extracted text or None if extraction fails
         """
         try:
-            # Run OCR in a thread pool to avoid blocking
+            # Run OCR in a worker process to avoid blocking
             loop = asyncio.get_event_loop()
-            text = await loop.run_in_executor(
-                None, 
-                self._process_image_sync, 
-                image_data
-            )
+            pool = self._pool
+            try:
+                text = await loop.run_in_executor(
+                    pool, 
+                    _process_image_sync, 
+                    image_data
+                )
+            except BrokenProcessPool:
+                self._restart_pool(pool)
+                raise
             
             if text and text.strip():
                 logger.info(f"OCR extracted {len(text)} characters")
@@ -58,75 +253,19 @@ class ImageOCR:
             logger.error(f"OCR processing failed: {e}")
             return None
     
-    def _process_image_sync(self, image_data: bytes) -> str:
+    async def extract_texts(self, images: List[bytes]) -> List[Optional[str]]:
         """
-        Synchronous image processing for OCR.
-        This runs in a thread pool to avoid blocking the event loop.
-        """
-        try:
-            # Open image from bytes
-            image = Image.open(io.BytesIO(image_data))
-            
-            # Convert to RGB if necessary (for PNG with transparency, etc.)
-            if image.mode != 'RGB':
-                image = image.convert('RGB')
-            
-            # Try multiple OCR configurations for better text extraction
-            configs = [
-                '--oem 3 --psm 6',  # Uniform block of text (default)
-                '--oem 3 --psm 3',  # Fully automatic page segmentation
-                '--oem 3 --psm 4',  # Single column of text
-                '--oem 3 --psm 7',  # Single text line
-                '--oem 3 --psm 8',  # Single word
-                '--oem 3 --psm 11', # Sparse text
-                '--oem 3 --psm 12', # Sparse text with OSD
-            ]
-            
-            best_text = ""
-            best_confidence = 0
-            
-            for config in configs:
-                try:
-                    # Extract text with current configuration
-                    text = pytesseract.image_to_string(image, config=config)
-                    
-                    if text and text.strip():
-                        # Try to get confidence score if possible
-                        try:
-                            data = pytesseract.image_to_data(image, config=config, output_type=pytesseract.Output.DICT)
-                            confidences = [int(conf) for conf in data['conf'] if int(conf) > 0]
-                            avg_confidence = sum(confidences) / len(confidences) if confidences else 0
-                            
-                            # Choose text with highest confidence and reasonable length
-                            if (avg_confidence > best_confidence and len(text.strip()) > len(best_text.strip())) or (not best_text and text.strip()):
-                                best_text = text
-                                best_confidence = avg_confidence
-                        except:
-                            # If confidence calculation fails, just use text length as metric
-                            if len(text.strip()) > len(best_text.strip()):
-                                best_text = text
-                                
-                except Exception as e:
-                    logger.debug(f"OCR config {config} failed: {e}")
-                    continue
-            
-            # Clean up the extracted text
-            if best_text:
-                # Remove excessive whitespace and clean up formatting
-                lines = [line.strip() for line in best_text.split('\n') if line.strip()]
-                best_text = '\n'.join(lines)
-                
-                # Remove common OCR artifacts
-                best_text = best_text.replace('|', 'I').replace('0', 'O').replace('5', 'S')
-                
-            return best_text
+        Extract text from several images in parallel.
+        
+        Args:
+            images: Raw image data for each image
             
-        except pytesseract.TesseractNotFoundError:
-            logger.error("Tesseract OCR not found. Please install Tesseract OCR.")
-            return ""
-        except Exception as e:
-            logger.error(f"Error in synchronous OCR processing: {e}")
-            return ""
+        Returns:
+            Extracted text (or None) for each image, in the same order
+        """
+        # One submission per image, so the pool spreads them across its workers
+        # and a failing image only loses its own result
+        return list(await asyncio.gather(*(self.extract_text(image_data) for image_data in images)))
     
     async def extract_text_from_file(self, file_path: str) -> Optional[str]:
         """
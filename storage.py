@@ -3,16 +3,49 @@ User Data Storage Module
 Handles persistent storage of user data using SQLite database.
 """
 
+import hashlib
 import logging
 import re
-from typing import List, Dict, Optional, Any
+from typing import Iterable, List, Dict, Optional, Any, Tuple
 import aiosqlite
 
 logger = logging.getLogger(__name__)
 
+# Characters stripped from stored text (crude SQL injection guard)
+_UNSAFE_CHARS = str.maketrans('', '', ';\'"\\')
+_EMAIL_RE = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+_URL_RE = re.compile(r'^https?://[^\s/$.?#].[^\s]*$')
+
+# Batch inserts for store_bulk that skip rows the user already has (the duplicate
+# checks done by store_password, store_credential, store_email and store_link)
+_INSERT_PASSWORD_SQL = """INSERT OR REPLACE INTO user_passwords (user_id, label, password)
+    SELECT ?, ?, ? WHERE NOT EXISTS (
+        SELECT 1 FROM user_passwords WHERE user_id = ? AND label = ? AND password = ?
+    )"""
+_INSERT_CREDENTIAL_SQL = """INSERT OR REPLACE INTO user_credentials (user_id, label, username, password)
+    SELECT ?, ?, ?, ? WHERE NOT EXISTS (
+        SELECT 1 FROM user_credentials WHERE user_id = ? AND label = ? AND username = ? AND password = ?
+    )"""
+_INSERT_EMAIL_SQL = """INSERT INTO user_emails (user_id, email)
+    SELECT ?, ? WHERE NOT EXISTS (
+        SELECT 1 FROM user_emails WHERE user_id = ? AND email = ?
+    )"""
+_INSERT_LINK_SQL = """INSERT INTO user_links (user_id, url, link_type)
+    SELECT ?, ?, ? WHERE NOT EXISTS (
+        SELECT 1 FROM user_links WHERE user_id = ? AND url = ?
+    )"""
+
 class UserStorage:
     """Handles storage and retrieval of user data."""
     
+    # Categories that can be counted on their own, and the table backing each
+    _CATEGORY_TABLES = {
+        "credentials": "user_credentials",
+        "notes": "user_notes",
+        "emails": "user_emails",
+        "links": "user_links",
+    }
+    
     def __init__(self, db_path: str = "user_data.db"):
         self.db_path = db_path
         # Maximum lengths for validation
@@ -22,6 +55,10 @@ class UserStorage:
         self.MAX_PASSWORD_LENGTH = 500
         self.MAX_EMAIL_LENGTH = 320
         self.MAX_URL_LENGTH = 2000
+        # Set once tables and pragmas have been applied
+        self._ready = False
+        # Whether the trigram full-text index over messages is available
+        self._fts = False
     
     def _validate_user_id(self, user_id: str) -> str:
         """Validate and sanitize user ID."""
@@ -41,9 +78,13 @@ class UserStorage:
             raise ValueError(f"Content too long (max {max_len} characters)")
         
         # Remove potential SQL injection patterns
-        content = re.sub(r'[;\'"\\]', '', content)
+        content = content.translate(_UNSAFE_CHARS)
         return content
     
+    def _content_digest(self, content: str) -> bytes:
+        """Digest used to deduplicate stored messages."""
+        return hashlib.blake2b(content.encode('utf-8'), digest_size=16).digest()
+    
     def _validate_label(self, label: str) -> str:
         """Validate and sanitize label."""
         return self._validate_content(label, self.MAX_LABEL_LENGTH)
@@ -60,7 +101,7 @@ class UserStorage:
         """Validate and sanitize email."""
         email = self._validate_content(email, self.MAX_EMAIL_LENGTH)
         # Basic email validation
-        if not re.match(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$', email):
+        if not _EMAIL_RE.match(email):
             raise ValueError("Invalid email format")
         return email
     
@@ -68,13 +109,20 @@ class UserStorage:
         """Validate and sanitize URL."""
         url = self._validate_content(url, self.MAX_URL_LENGTH)
         # Basic URL validation
-        if not re.match(r'^https?://[^\s/$.?#].[^\s]*$', url):
+        if not _URL_RE.match(url):
             raise ValueError("Invalid URL format")
         return url
         
     async def initialize(self):
         """Initialize the database and create tables if they don't exist."""
+        if self._ready:
+            return
+        
         async with aiosqlite.connect(self.db_path) as db:
+            # WAL lets readers run alongside the background message writer
+            await db.execute("PRAGMA journal_mode=WAL")
+            await db.execute("PRAGMA synchronous=NORMAL")
+            
             await db.execute("""
                 CREATE TABLE IF NOT EXISTS user_messages (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -85,6 +133,31 @@ class UserStorage:
                 )
             """)
             
+            # Messages are deduplicated per user on a digest of their content
+            cursor = await db.execute("PRAGMA table_info(user_messages)")
+            columns = [row[1] for row in await cursor.fetchall()]
+            if "content_sha" not in columns:
+                await db.execute("ALTER TABLE user_messages ADD COLUMN content_sha BLOB")
+            # Rows saved before the column existed have no digest, and NULLs never
+            # conflict in the unique index; hash them and keep only the oldest copy
+            cursor = await db.execute("SELECT id, content FROM user_messages WHERE content_sha IS NULL")
+            legacy_rows = await cursor.fetchall()
+            if legacy_rows:
+                await db.execute("DROP INDEX IF EXISTS idx_user_messages_sha")
+                await db.executemany(
+                    "UPDATE user_messages SET content_sha = ? WHERE id = ?",
+                    [(self._content_digest(content), row_id) for row_id, content in legacy_rows]
+                )
+                await db.execute("""
+                    DELETE FROM user_messages WHERE id NOT IN (
+                        SELECT MIN(id) FROM user_messages GROUP BY user_id, content_sha
+                    )
+                """)
+            await db.execute(
+                "CREATE UNIQUE INDEX IF NOT EXISTS idx_user_messages_sha ON user_messages(user_id, content_sha)"
+            )
+            await self._init_message_search(db)
+            
             await db.execute("""
                 CREATE TABLE IF NOT EXISTS user_passwords (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -138,8 +211,48 @@ class UserStorage:
             """)
             
             await db.commit()
+            self._ready = True
             logger.info("Database initialized successfully")
     
+    async def _init_message_search(self, db):
+        """Create the trigram full-text index over user_messages, if this SQLite build supports it."""
+        try:
+            cursor = await db.execute("SELECT 1 FROM sqlite_master WHERE name = 'user_messages_fts'")
+            exists = await cursor.fetchone() is not None
+            
+            await db.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS user_messages_fts USING fts5(
+                    content, content='user_messages', content_rowid='id', tokenize='trigram'
+                )
+            """)
+            
+            # Keep the external-content index in step with the messages table
+            await db.execute("""
+                CREATE TRIGGER IF NOT EXISTS user_messages_fts_ai AFTER INSERT ON user_messages BEGIN
+                    INSERT INTO user_messages_fts(rowid, content) VALUES (new.id, new.content);
+                END
+            """)
+            await db.execute("""
+                CREATE TRIGGER IF NOT EXISTS user_messages_fts_ad AFTER DELETE ON user_messages BEGIN
+                    INSERT INTO user_messages_fts(user_messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+                END
+            """)
+            await db.execute("""
+                CREATE TRIGGER IF NOT EXISTS user_messages_fts_au AFTER UPDATE OF content ON user_messages BEGIN
+                    INSERT INTO user_messages_fts(user_messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+                    INSERT INTO user_messages_fts(rowid, content) VALUES (new.id, new.content);
+                END
+            """)
+            
+            # Index messages stored before the index existed
+            if not exists:
+                await db.execute("INSERT INTO user_messages_fts(user_messages_fts) VALUES ('rebuild')")
+            
+            self._fts = True
+        except Exception as e:
+            logger.info(f"Full-text search unavailable, searching messages by scan: {e}")
+            self._fts = False
+    
     async def store_message(self, user_id: str, content: str, message_type: str = "text"):
         """Store a message from a user."""
         try:
@@ -149,8 +262,8 @@ class UserStorage:
             
             async with aiosqlite.connect(self.db_path) as db:
                 await db.execute(
-                    "INSERT INTO user_messages (user_id, content, message_type) VALUES (?, ?, ?)",
-                    (user_id, content, message_type)
+                    "INSERT OR IGNORE INTO user_messages (user_id, content, message_type, content_sha) VALUES (?, ?, ?, ?)",
+                    (user_id, content, message_type, self._content_digest(content))
                 )
                 await db.commit()
         except ValueError as e:
@@ -158,6 +271,35 @@ class UserStorage:
         except Exception as e:
             logger.error(f"Error storing message for user {user_id}: {e}")
     
+    async def store_messages_bulk(self, messages: List[Tuple[str, str, str]]):
+        """Store a batch of (user_id, content, message_type) rows in one transaction."""
+        rows = []
+        for user_id, content, message_type in messages:
+            try:
+                content = self._validate_content(content)
+                rows.append((
+                    self._validate_user_id(user_id),
+                    content,
+                    self._validate_content(message_type, 50),
+                    self._content_digest(content)
+                ))
+            except ValueError as e:
+                logger.warning(f"Validation error storing message for user {user_id}: {e}")
+        
+        if not rows:
+            return
+        
+        try:
+            async with aiosqlite.connect(self.db_path) as db:
+                await db.execute("PRAGMA synchronous=NORMAL")
+                await db.executemany(
+                    "INSERT OR IGNORE INTO user_messages (user_id, content, message_type, content_sha) VALUES (?, ?, ?, ?)",
+                    rows
+                )
+                await db.commit()
+        except Exception as e:
+            logger.error(f"Error storing {len(rows)} messages: {e}")
+    
     async def store_password(self, user_id: str, label: str, password: str):
         """Store a password for a user with a specific label."""
         try:
@@ -214,12 +356,14 @@ class UserStorage:
             logger.error(f"Error storing credentials for user {user_id}: {e}")
     
     async def get_credential(self, user_id: str, label: str) -> Optional[Dict[str, str]]:
-        """Retrieve username and password credentials for a user by label."""
+        """Retrieve username and password credentials for a user by label (case-insensitive, exact case preferred)."""
         try:
             async with aiosqlite.connect(self.db_path) as db:
                 cursor = await db.execute(
-                    "SELECT username, password FROM user_credentials WHERE user_id = ? AND label = ?",
-                    (str(user_id), label)
+                    """SELECT username, password FROM user_credentials
+                       WHERE user_id = ? AND label = ? COLLATE NOCASE
+                       ORDER BY label = ? DESC, timestamp DESC LIMIT 1""",
+                    (str(user_id), label, label)
                 )
                 result = await cursor.fetchone()
                 if result:
@@ -229,13 +373,13 @@ class UserStorage:
             logger.error(f"Error retrieving credentials for user {user_id}: {e}")
             return None
     
-    async def get_all_credentials(self, user_id: str) -> List[Dict[str, str]]:
-        """Retrieve all credentials for a user."""
+    async def get_all_credentials(self, user_id: str, limit: int = -1) -> List[Dict[str, str]]:
+        """Retrieve all credentials for a user (most recent first, optionally limited)."""
         try:
             async with aiosqlite.connect(self.db_path) as db:
                 cursor = await db.execute(
-                    "SELECT label, username, password FROM user_credentials WHERE user_id = ? ORDER BY timestamp DESC",
-                    (str(user_id),)
+                    "SELECT label, username, password FROM user_credentials WHERE user_id = ? ORDER BY timestamp DESC LIMIT ?",
+                    (str(user_id), limit)
                 )
                 results = await cursor.fetchall()
                 return [
@@ -247,12 +391,14 @@ class UserStorage:
             return []
     
     async def get_password(self, user_id: str, label: str) -> Optional[str]:
-        """Retrieve a password for a user by label."""
+        """Retrieve a password for a user by label (case-insensitive, exact case preferred)."""
         try:
             async with aiosqlite.connect(self.db_path) as db:
                 cursor = await db.execute(
-                    "SELECT password FROM user_passwords WHERE user_id = ? AND label = ?",
-                    (str(user_id), label)
+                    """SELECT password FROM user_passwords
+                       WHERE user_id = ? AND label = ? COLLATE NOCASE
+                       ORDER BY label = ? DESC, timestamp DESC LIMIT 1""",
+                    (str(user_id), label, label)
                 )
                 result = await cursor.fetchone()
                 return result[0] if result else None
@@ -285,13 +431,13 @@ class UserStorage:
         except Exception as e:
             logger.error(f"Error storing note for user {user_id}: {e}")
     
-    async def get_notes(self, user_id: str) -> List[str]:
-        """Retrieve all notes for a user."""
+    async def get_notes(self, user_id: str, limit: int = -1) -> List[str]:
+        """Retrieve all notes for a user (most recent first, optionally limited)."""
         try:
             async with aiosqlite.connect(self.db_path) as db:
                 cursor = await db.execute(
-                    "SELECT note FROM user_notes WHERE user_id = ? ORDER BY timestamp DESC",
-                    (str(user_id),)
+                    "SELECT note FROM user_notes WHERE user_id = ? ORDER BY timestamp DESC LIMIT ?",
+                    (str(user_id), limit)
                 )
                 results = await cursor.fetchall()
                 return [row[0] for row in results]
@@ -325,13 +471,13 @@ class UserStorage:
         except Exception as e:
             logger.error(f"Error storing email for user {user_id}: {e}")
     
-    async def get_emails(self, user_id: str) -> List[Dict[str, str]]:
-        """Retrieve all email addresses for a user."""
+    async def get_emails(self, user_id: str, limit: int = -1) -> List[Dict[str, str]]:
+        """Retrieve all email addresses for a user (most recent first, optionally limited)."""
         try:
             async with aiosqlite.connect(self.db_path) as db:
                 cursor = await db.execute(
-                    "SELECT email, label FROM user_emails WHERE user_id = ? ORDER BY timestamp DESC",
-                    (str(user_id),)
+                    "SELECT email, label FROM user_emails WHERE user_id = ? ORDER BY timestamp DESC LIMIT ?",
+                    (str(user_id), limit)
                 )
                 results = await cursor.fetchall()
                 return [{"email": row[0], "label": row[1]} for row in results]
@@ -365,13 +511,122 @@ class UserStorage:
         except Exception as e:
             logger.error(f"Error storing link for user {user_id}: {e}")
     
-    async def get_links(self, user_id: str) -> List[Dict[str, str]]:
-        """Retrieve all links for a user."""
+    async def store_bulk(self, user_id: str,
+                         passwords: Iterable[Tuple[str, str]] = (),
+                         credentials: Iterable[Tuple[str, str, str]] = (),
+                         emails: Iterable[str] = (),
+                         links: Iterable[Tuple[str, Optional[str]]] = (),
+                         note: Optional[str] = None) -> bool:
+        """
+        Store everything detected in one message in a single transaction.
+        
+        Args:
+            user_id: Discord user ID
+            passwords: (label, password) pairs
+            credentials: (label, username, password) triples
+            emails: Email addresses
+            links: (url, link_type) pairs
+            note: Note text, if the message should also be kept as a note
+        
+        Returns:
+            False if the write failed (e.g. the database was locked), else True
+        
+        Rows the user already has are skipped, as with the single-item store methods.
+        """
+        try:
+            user_id = self._validate_user_id(user_id)
+        except ValueError as e:
+            logger.warning(f"Validation error storing data for user {user_id}: {e}")
+            return True
+        
+        password_rows = []
+        for label, password in passwords:
+            try:
+                label = self._validate_label(label)
+                password = self._validate_password(password)
+                password_rows.append((user_id, label, password, user_id, label, password))
+            except ValueError as e:
+                logger.warning(f"Validation error storing password for user {user_id}: {e}")
+        
+        credential_rows = []
+        for label, username, password in credentials:
+            try:
+                label = self._validate_label(label)
+                username = self._validate_username(username)
+                password = self._validate_password(password)
+                credential_rows.append((user_id, label, username, password, user_id, label, username, password))
+            except ValueError as e:
+                logger.warning(f"Validation error storing credentials for user {user_id}: {e}")
+        
+        email_rows = self._email_rows(user_id, emails)
+        link_rows = self._link_rows(user_id, links)
+        
+        if note is not None:
+            try:
+                note = self._validate_content(note)
+            except ValueError as e:
+                logger.warning(f"Validation error storing note for user {user_id}: {e}")
+                note = None
+        
+        if not (password_rows or credential_rows or email_rows or link_rows or note):
+            return True
+        
+        try:
+            async with aiosqlite.connect(self.db_path) as db:
+                if password_rows:
+                    await db.executemany(_INSERT_PASSWORD_SQL, password_rows)
+                if credential_rows:
+                    await db.executemany(_INSERT_CREDENTIAL_SQL, credential_rows)
+                if email_rows:
+                    await db.executemany(_INSERT_EMAIL_SQL, email_rows)
+                if link_rows:
+                    await db.executemany(_INSERT_LINK_SQL, link_rows)
+                if note:
+                    # Same note within the last hour counts as a duplicate
+                    await db.execute(
+                        """INSERT INTO user_notes (user_id, note)
+                           SELECT ?, ? WHERE NOT EXISTS (
+                               SELECT 1 FROM user_notes WHERE user_id = ? AND note = ?
+                               AND timestamp > datetime('now', '-1 hour')
+                           )""",
+                        (user_id, note, user_id, note)
+                    )
+                await db.commit()
+            return True
+        except Exception as e:
+            logger.error(f"Error storing detected data for user {user_id}: {e}")
+            return False
+    
+    def _email_rows(self, user_id: str, emails: Iterable[str]) -> List[tuple]:
+        """Validate emails into parameter rows for _INSERT_EMAIL_SQL, skipping invalid ones."""
+        rows = []
+        for email in emails:
+            try:
+                email = self._validate_email(email)
+                rows.append((user_id, email, user_id, email))
+            except ValueError as e:
+                logger.warning(f"Validation error storing email for user {user_id}: {e}")
+        return rows
+    
+    def _link_rows(self, user_id: str, links: Iterable[Tuple[str, Optional[str]]]) -> List[tuple]:
+        """Validate (url, link_type) pairs into parameter rows for _INSERT_LINK_SQL, skipping invalid ones."""
+        rows = []
+        for url, link_type in links:
+            try:
+                url = self._validate_url(url)
+                link_type = self._validate_content(link_type, 50) if link_type is not None else None
+                rows.append((user_id, url, link_type, user_id, url))
+            except ValueError as e:
+                logger.warning(f"Validation error storing link for user {user_id}: {e}")
+        return rows
+    
+    async def get_links(self, user_id: str, limit: int = -1) -> List[Dict[str, str]]:
+        """Retrieve all links for a user (most recent first, optionally limited)."""
         try:
             async with aiosqlite.connect(self.db_path) as db:
                 cursor = await db.execute(
-                    "SELECT url, link_type FROM user_links WHERE user_id = ? ORDER BY timestamp DESC",
-                    (str(user_id),)
+                    "SELECT url, link_type FROM user_links WHERE user_id = ? ORDER BY timestamp DESC LIMIT ?",
+                    (str(user_id), limit)
                 )
                 results = await cursor.fetchall()
                 return [{"url": row[0], "type": row[1]} for row in results]
@@ -383,54 +638,39 @@ class UserStorage:
         """Get counts of all data categories for a user."""
         try:
             async with aiosqlite.connect(self.db_path) as db:
-                categories = {}
-                
-                # Count passwords
-                cursor = await db.execute(
-                    "SELECT COUNT(*) FROM user_passwords WHERE user_id = ?",
-                    (str(user_id),)
-                )
-                categories["passwords"] = (await cursor.fetchone())[0]
-                
-                # Count credentials
-                cursor = await db.execute(
-                    "SELECT COUNT(*) FROM user_credentials WHERE user_id = ?",
-                    (str(user_id),)
-                )
-                categories["credentials"] = (await cursor.fetchone())[0]
-                
-                # Count notes
-                cursor = await db.execute(
-                    "SELECT COUNT(*) FROM user_notes WHERE user_id = ?",
-                    (str(user_id),)
-                )
-                categories["notes"] = (await cursor.fetchone())[0]
-                
-                # Count emails
-                cursor = await db.execute(
-                    "SELECT COUNT(*) FROM user_emails WHERE user_id = ?",
-                    (str(user_id),)
-                )
-                categories["emails"] = (await cursor.fetchone())[0]
-                
-                # Count links
+                # All six counts in one statement
                 cursor = await db.execute(
-                    "SELECT COUNT(*) FROM user_links WHERE user_id = ?",
-                    (str(user_id),)
+                    """SELECT
+                           (SELECT COUNT(*) FROM user_passwords WHERE user_id = :user_id),
+                           (SELECT COUNT(*) FROM user_credentials WHERE user_id = :user_id),
+                           (SELECT COUNT(*) FROM user_notes WHERE user_id = :user_id),
+                           (SELECT COUNT(*) FROM user_emails WHERE user_id = :user_id),
+                           (SELECT COUNT(*) FROM user_links WHERE user_id = :user_id),
+                           (SELECT COUNT(*) FROM user_messages WHERE user_id = :user_id)""",
+                    {"user_id": str(user_id)}
                 )
-                categories["links"] = (await cursor.fetchone())[0]
-                
-                # Count total messages
+                row = await cursor.fetchone()
+                return dict(zip(
+                    ("passwords", "credentials", "notes", "emails", "links", "total_messages"),
+                    row
+                ))
+        except Exception as e:
+            logger.error(f"Error getting categories for user {user_id}: {e}")
+            return {"passwords": 0, "credentials": 0, "notes": 0, "emails": 0, "links": 0, "total_messages": 0}
+    
+    async def count_category(self, user_id: str, category: str) -> int:
+        """Count stored rows of one category (credentials, notes, emails or links)."""
+        table = self._CATEGORY_TABLES[category]
+        try:
+            async with aiosqlite.connect(self.db_path) as db:
                 cursor = await db.execute(
-                    "SELECT COUNT(*) FROM user_messages WHERE user_id = ?",
+                    f"SELECT COUNT(*) FROM {table} WHERE user_id = ?",
                     (str(user_id),)
                 )
-                categories["total_messages"] = (await cursor.fetchone())[0]
-                
-                return categories
+                return (await cursor.fetchone())[0]
         except Exception as e:
-            logger.error(f"Error getting categories for user {user_id}: {e}")
-            return {"passwords": 0, "credentials": 0, "notes": 0, "emails": 0, "links": 0, "total_messages": 0}
+            logger.error(f"Error counting {category} for user {user_id}: {e}")
+            return 0
     
     async def clear_user_data(self, user_id: str):
         """Clear all data for a specific user."""
@@ -469,6 +709,59 @@ class UserStorage:
             logger.error(f"Error getting recent messages for user {user_id}: {e}")
             return []
     
+    def _message_search_clause(self, user_id: str, term: str) -> Tuple[str, tuple]:
+        """Build the FROM/WHERE clause (and parameters) selecting a user's messages that contain term."""
+        if self._fts and len(term) >= 3:
+            # The trigram index matches any substring of 3+ characters, case-insensitively
+            phrase = '"' + term.replace('"', '""') + '"'
+            return (
+                """FROM user_messages
+                   WHERE id IN (SELECT rowid FROM user_messages_fts WHERE user_messages_fts MATCH ?)
+                   AND user_id = ?""",
+                (phrase, str(user_id))
+            )
+        
+        # SQLite's lower() only folds ASCII; unicode_lower is str.lower, registered by the caller
+        return (
+            "FROM user_messages WHERE user_id = ? AND instr(unicode_lower(content), ?) > 0",
+            (str(user_id), term.lower())
+        )
+    
+    async def search_messages(self, user_id: str, term: str, limit: int = -1) -> List[Dict[str, Any]]:
+        """Find a user's messages containing term (case-insensitive), most recent first."""
+        clause, params = self._message_search_clause(user_id, term)
+        try:
+            async with aiosqlite.connect(self.db_path) as db:
+                await db.create_function("unicode_lower", 1, str.lower, deterministic=True)
+                cursor = await db.execute(
+                    f"SELECT content, message_type, timestamp {clause} ORDER BY timestamp DESC LIMIT ?",
+                    params + (limit,)
+                )
+                results = await cursor.fetchall()
+                return [
+                    {
+                        "content": row[0],
+                        "type": row[1],
+                        "timestamp": row[2]
+                    }
+                    for row in results
+                ]
+        except Exception as e:
+            logger.error(f"Error searching messages for user {user_id}: {e}")
+            return []
+    
+    async def count_search_matches(self, user_id: str, term: str) -> int:
+        """Count a user's messages containing term (case-insensitive)."""
+        clause, params = self._message_search_clause(user_id, term)
+        try:
+            async with aiosqlite.connect(self.db_path) as db:
+                await db.create_function("unicode_lower", 1, str.lower, deterministic=True)
+                cursor = await db.execute(f"SELECT COUNT(*) {clause}", params)
+                return (await cursor.fetchone())[0]
+        except Exception as e:
+            logger.error(f"Error counting search matches for user {user_id}: {e}")
+            return 0
+    
     async def clear_duplicates(self, user_id: str):
         """Remove duplicate entries for a user."""
         try:
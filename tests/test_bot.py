@@ -0,0 +1,62 @@
+"""Tests for the bot's per-user rate limiter."""
+
+import asyncio
+import os
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("discord")
+pytest.importorskip("cachetools")
+pytest.importorskip("PIL")
+pytest.importorskip("pytesseract")
+
+# Keep the bot module's log file out of the working tree
+os.environ.setdefault("LOG_FILE", os.devnull)
+
+import bot
+from cachetools import TTLCache
+
+
+@pytest.fixture
+def limiter(monkeypatch):
+    clock = SimpleNamespace(now=0.0)
+    monkeypatch.setattr(bot.time, "monotonic", lambda: clock.now)
+    state = SimpleNamespace(
+        max_messages_per_minute=10,
+        max_commands_per_minute=5,
+        rate_limit_window=60,
+        user_message_times=TTLCache(maxsize=100, ttl=120, timer=lambda: clock.now),
+    )
+
+    def check(at, is_command=False):
+        clock.now = at
+        return asyncio.run(bot.PersonalDataBot._check_rate_limit(state, 1, is_command))
+
+    return check
+
+
+def test_message_limit_boundary(limiter):
+    assert all(limiter(t) for t in range(10))
+    # The 10th most recent message (t=0) is still inside the window
+    assert not limiter(59.9)
+    # ...and leaves it after exactly one window
+    assert limiter(60)
+    # Now t=1 is the 10th most recent
+    assert not limiter(60.5)
+    assert limiter(61)
+
+
+def test_command_limit_boundary(limiter):
+    assert all(limiter(t, is_command=True) for t in range(5))
+    assert not limiter(59.9, is_command=True)
+    assert limiter(60, is_command=True)
+    # Commands count against the message limit too, but it is higher
+    assert limiter(60.5)
+
+
+def test_rejected_messages_are_not_recorded(limiter):
+    assert all(limiter(t) for t in range(10))
+    for t in (10, 20, 30, 40, 50):
+        assert not limiter(t)
+    assert limiter(60)
@@ -0,0 +1,71 @@
+"""Tests for CommandHandler command dispatch."""
+
+import asyncio
+
+from commands import CommandHandler
+
+
+class FakeStorage:
+    """Records the store calls made by a handler."""
+
+    def __init__(self):
+        self.passwords = []
+        self.credentials = []
+        self.bulk_calls = []
+        # Results for successive store_bulk calls (True once these run out)
+        self.bulk_results = []
+
+    async def store_password(self, user_id, label, password):
+        self.passwords.append((user_id, label, password))
+
+    async def store_credential(self, user_id, label, username, password):
+        self.credentials.append((user_id, label, username, password))
+
+    async def store_bulk(self, user_id, **data):
+        self.bulk_calls.append(data)
+        return self.bulk_results.pop(0) if self.bulk_results else True
+
+
+def _handle(command):
+    storage = FakeStorage()
+    handler = CommandHandler(storage, ocr=None)
+    response = asyncio.run(handler.handle_command("1", command))
+    return storage, response
+
+
+def test_quick_store_strips_prefix_in_any_case():
+    storage, response = _handle("!STORE Gmail JohnDoe MyPass123")
+    assert response.startswith("✅")
+    assert storage.credentials == [("1", "Gmail", "JohnDoe", "MyPass123")]
+
+
+def test_quick_save_strips_prefix_and_keeps_case():
+    storage, response = _handle("  !Save Netflix MyPass456  ")
+    assert response.startswith("✅")
+    assert storage.passwords == [("1", "Netflix", "MyPass456")]
+
+
+def test_quick_store_without_content_shows_usage():
+    storage, response = _handle("!Store")
+    assert response.startswith("**Quick Store Usage:**")
+    assert not storage.passwords and not storage.credentials
+
+
+def test_auto_store_skips_content_already_stored():
+    storage = FakeStorage()
+    handler = CommandHandler(storage, ocr=None)
+    for _ in range(2):
+        asyncio.run(handler.handle_command("1", "Remember to renew the car insurance"))
+
+    assert len(storage.bulk_calls) == 1
+
+
+def test_auto_store_retries_content_whose_write_failed():
+    storage = FakeStorage()
+    storage.bulk_results = [False]
+    handler = CommandHandler(storage, ocr=None)
+    for _ in range(3):
+        asyncio.run(handler.handle_command("1", "Remember to renew the car insurance"))
+
+    # The failed write is retried once, then the stored content is skipped
+    assert len(storage.bulk_calls) == 2
@@ -0,0 +1,85 @@
+"""Tests for ImageOCR's worker pool handling."""
+
+import asyncio
+from concurrent.futures import Executor, Future
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+pytest.importorskip("PIL")
+pytest.importorskip("pytesseract")
+
+import ocr
+
+# What the fake workers return (or raise) for each image
+OUTCOMES = {
+    b"text": "  Gmail\npass123  ",
+    b"blank": "",
+    b"error": ValueError("cannot identify image file"),
+    b"crash": BrokenProcessPool("A process in the process pool was terminated abruptly"),
+}
+
+
+class FakePool(Executor):
+    """Runs submissions inline, mapping each image to its entry in OUTCOMES."""
+
+    def __init__(self):
+        self.submitted = []
+        self.shutdown_calls = []
+
+    def submit(self, fn, image_data):
+        assert fn is ocr._process_image_sync
+        self.submitted.append(image_data)
+        future = Future()
+        outcome = OUTCOMES[image_data]
+        if isinstance(outcome, BaseException):
+            future.set_exception(outcome)
+        else:
+            future.set_result(outcome)
+        return future
+
+    def shutdown(self, wait=True, *, cancel_futures=False):
+        self.shutdown_calls.append(cancel_futures)
+
+
+@pytest.fixture
+def pools(monkeypatch):
+    created = []
+
+    def create_pool(self):
+        created.append(FakePool())
+        return created[-1]
+
+    monkeypatch.setattr(ocr.ImageOCR, "_create_pool", create_pool)
+    return created
+
+
+def test_extract_texts_returns_a_result_per_image(pools):
+    image_ocr = ocr.ImageOCR(max_workers=2)
+    texts = asyncio.run(image_ocr.extract_texts([b"text", b"blank", b"error", b"text"]))
+
+    assert texts == ["Gmail\npass123", None, None, "Gmail\npass123"]
+    # Each image is its own submission, so the pool can run them on different workers
+    assert pools[0].submitted == [b"text", b"blank", b"error", b"text"]
+    assert len(pools) == 1
+
+
+def test_broken_pool_is_restarted(pools):
+    image_ocr = ocr.ImageOCR(max_workers=2)
+    texts = asyncio.run(image_ocr.extract_texts([b"text", b"crash", b"crash"]))
+
+    assert texts == ["Gmail\npass123", None, None]
+    # Both failed images saw the same broken pool, which is replaced only once
+    assert len(pools) == 2
+    assert pools[0].shutdown_calls == [True]
+    assert image_ocr._pool is pools[1]
+
+    assert asyncio.run(image_ocr.extract_text(b"text")) == "Gmail\npass123"
+    assert pools[1].submitted == [b"text"]
+
+
+def test_close_shuts_down_the_pool(pools):
+    image_ocr = ocr.ImageOCR()
+    image_ocr.close()
+
+    assert pools[0].shutdown_calls == [True]
@@ -0,0 +1,123 @@
+"""Tests for UserStorage."""
+
+import asyncio
+import sqlite3
+
+import pytest
+
+pytest.importorskip("aiosqlite")
+
+from storage import UserStorage
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = UserStorage(str(tmp_path / "test.db"))
+    asyncio.run(storage.initialize())
+    return storage
+
+
+def test_store_bulk_reports_failed_writes(tmp_path):
+    storage = UserStorage(str(tmp_path / "test.db"))
+    asyncio.run(storage.initialize())
+    assert asyncio.run(storage.store_bulk("1", passwords=[("Netflix", "pass456")])) is True
+
+    db = sqlite3.connect(storage.db_path)
+    db.execute("DROP TABLE user_passwords")
+    db.close()
+    assert asyncio.run(storage.store_bulk("1", passwords=[("Gmail", "pass789")])) is False
+
+
+def test_store_message_ignores_duplicates(storage):
+    asyncio.run(storage.store_message("1", "hello there"))
+    asyncio.run(storage.store_message("1", "  hello there  "))
+    asyncio.run(storage.store_messages_bulk([("1", "hello there", "text"), ("2", "hello there", "text")]))
+
+    assert asyncio.run(storage.get_all_categories("1"))["total_messages"] == 1
+    assert asyncio.run(storage.get_all_categories("2"))["total_messages"] == 1
+
+
+def test_initialize_dedups_legacy_messages(tmp_path):
+    db_path = str(tmp_path / "legacy.db")
+    db = sqlite3.connect(db_path)
+    db.execute("""
+        CREATE TABLE user_messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT NOT NULL,
+            content TEXT NOT NULL,
+            message_type TEXT NOT NULL,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    db.executemany(
+        "INSERT INTO user_messages (user_id, content, message_type) VALUES (?, ?, 'text')",
+        [("1", "hello"), ("1", "hello"), ("2", "hello"), ("1", "other")]
+    )
+    db.commit()
+    db.close()
+
+    storage = UserStorage(db_path)
+    asyncio.run(storage.initialize())
+    asyncio.run(storage.store_message("1", "hello"))
+
+    db = sqlite3.connect(db_path)
+    rows = db.execute("SELECT id, user_id, content FROM user_messages ORDER BY id").fetchall()
+    db.close()
+    assert rows == [(1, "1", "hello"), (3, "2", "hello"), (4, "1", "other")]
+
+
+def test_store_bulk_skips_existing_rows(storage):
+    batch = dict(
+        passwords=[("Netflix", "pass456"), ("Netflix", "pass456")],
+        credentials=[("Gmail", "john@email.com", "mypass123")],
+        emails=["john@email.com", "john@email.com"],
+        links=[("https://github.com/user", "github")],
+        note="Gmail john@email.com mypass123",
+    )
+    asyncio.run(storage.store_bulk("1", **batch))
+    asyncio.run(storage.store_bulk("1", **batch))
+    asyncio.run(storage.store_bulk("2", **batch))
+
+    counts = asyncio.run(storage.get_all_categories("1"))
+    assert counts["passwords"] == 1
+    assert counts["credentials"] == 1
+    assert counts["emails"] == 1
+    assert counts["links"] == 1
+    assert counts["notes"] == 1
+    assert asyncio.run(storage.get_all_categories("2"))["passwords"] == 1
+
+
+@pytest.mark.parametrize("use_fts", [True, False])
+def test_search_messages(storage, use_fts):
+    if use_fts and not storage._fts:
+        pytest.skip("SQLite build has no FTS5 trigram tokenizer")
+    storage._fts = use_fts
+    for content in ("My Gmail login", "gmail backup codes", "Netflix", "a-b OR c"):
+        asyncio.run(storage.store_message("1", content))
+    asyncio.run(storage.store_message("2", "gmail for someone else"))
+
+    found = asyncio.run(storage.search_messages("1", "GMAIL"))
+    assert sorted(m["content"] for m in found) == ["My Gmail login", "gmail backup codes"]
+    assert asyncio.run(storage.count_search_matches("1", "GMAIL")) == 2
+    assert len(asyncio.run(storage.search_messages("1", "gmail", limit=1))) == 1
+
+    # FTS query syntax in the term is matched literally
+    assert asyncio.run(storage.count_search_matches("1", "a-b OR")) == 1
+    assert asyncio.run(storage.count_search_matches("1", "b OR x")) == 0
+
+    # Terms shorter than a trigram fall back to a substring scan
+    assert asyncio.run(storage.count_search_matches("1", "-")) == 1
+    assert [m["content"] for m in asyncio.run(storage.search_messages("1", "fl"))] == ["Netflix"]
+    assert asyncio.run(storage.count_search_matches("1", "zz")) == 0
+
+
+@pytest.mark.parametrize("use_fts", [True, False])
+def test_search_messages_folds_unicode_case(storage, use_fts):
+    if use_fts and not storage._fts:
+        pytest.skip("SQLite build has no FTS5 trigram tokenizer")
+    storage._fts = use_fts
+    asyncio.run(storage.store_message("1", "Résumé for ÉTÉ trip"))
+
+    for term in ("ét", "été", "RÉSUMÉ"):
+        assert asyncio.run(storage.count_search_matches("1", term)) == 1
+        assert [m["content"] for m in asyncio.run(storage.search_messages("1", term))] == ["Résumé for ÉTÉ trip"]
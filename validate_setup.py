@@ -31,6 +31,7 @@ def check_optional_dependencies() -> Tuple[bool, List[str]]:
     optional_deps = {
         "discord.py": "discord",
         "aiosqlite": "aiosqlite", 
+        "cachetools": "cachetools",
         "Pillow": "PIL",
         "pytesseract": "pytesseract",
         "Flask": "flask"